@@ -0,0 +1,44 @@
+"""
+Compare read and write throughput of the SQLite profiles in items.sqldb.
+
+    $ python benchmarks/profiles.py --items 2000
+"""
+import argparse
+import tempfile
+import time
+
+from items import Item, ItemsDB
+from items.sqldb import PROFILES
+
+
+def bench(profile, num_items):
+    with tempfile.TemporaryDirectory() as db_path:
+        db = ItemsDB(db_path, profile=profile)
+
+        start = time.perf_counter()
+        for i in range(num_items):
+            db.add_item(Item(summary=f"item {i}", owner=f"owner {i % 10}"))
+        writes = num_items / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i in range(100):
+            db.list_items(owner=f"owner {i % 10}")
+        reads = 100 / (time.perf_counter() - start)
+
+        db.close()
+    return writes, reads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'profile':10} {'add_item/s':>12} {'list_items/s':>14}")
+    for profile in PROFILES:
+        writes, reads = bench(profile, args.items)
+        print(f"{profile:10} {writes:12.0f} {reads:14.0f}")
+
+
+if __name__ == "__main__":
+    main()
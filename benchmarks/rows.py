@@ -0,0 +1,45 @@
+"""
+Compare time and memory per row of Item objects and read-only ItemRow tuples.
+
+    $ python benchmarks/rows.py --items 100000
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+
+from items import Item, ItemsDB
+
+
+def measure(read):
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = read()
+    seconds = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds / len(rows), size / len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_path:
+        db = ItemsDB(db_path)
+        db.add_items(
+            Item(summary=f"item {i}", owner=f"owner {i % 10}") for i in range(args.items)
+        )
+        print(f"{'rows':10} {'µs per row':>12} {'bytes per row':>14}")
+        for name, read in (
+            ("Item", lambda: db.list_items()),
+            ("ItemRow", lambda: db.list_items(read_only=True)),
+        ):
+            seconds, size = measure(read)
+            print(f"{name:10} {seconds * 1e6:12.2f} {size:14.0f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
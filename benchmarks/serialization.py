@@ -0,0 +1,57 @@
+"""
+Compare ways of turning the items of a db into a JSON response body.
+
+    $ python benchmarks/serialization.py --items 10000
+"""
+import argparse
+import json
+import tempfile
+import timeit
+
+import pydantic_core
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from items import Item, ItemsDB
+from items.rest_api import get_json_dumps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_path:
+        db = ItemsDB(db_path)
+        db.add_items(
+            Item(summary=f"item {i}", owner=f"owner {i % 10}") for i in range(args.items)
+        )
+        adapter = TypeAdapter(list[Item])
+        dumps = get_json_dumps()
+
+        def stdlib_items():
+            # What FastAPI does by default: validate, encode, json.dumps.
+            the_items = adapter.validate_python(db.list_items())
+            return json.dumps(jsonable_encoder(the_items)).encode()
+
+        def type_adapter_items():
+            return adapter.dump_json(db.list_items())
+
+        def pydantic_core_rows():
+            rows = db.list_rows()
+            return pydantic_core.to_json([r._asdict() for r in rows])
+
+        def default_rows():
+            rows = db.list_rows()
+            return dumps([r._asdict() for r in rows])
+
+        print(f"{'path':24} {'ms per response':>16}")
+        for bench in (stdlib_items, type_adapter_items, pydantic_core_rows, default_rows):
+            seconds = min(timeit.repeat(bench, number=1, repeat=args.repeat))
+            print(f"{bench.__name__:24} {seconds * 1000:16.1f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Load test `items serve` with increasing numbers of worker processes.
+
+    $ python benchmarks/serve.py --workers 1 2 4 --clients 8 --seconds 10
+    $ python benchmarks/serve.py --workers 1 --write-ratio 1 --group-commit 0 100
+
+For each number of workers, a server is started on a fresh db seeded with
+--items items. Client processes then send requests for --seconds seconds:
+mostly GET /items pages, and POST /add_item for a --write-ratio share.
+Requests per second should grow with the number of workers, up to the
+number of CPUs, while no request fails on a locked db. Every run is
+repeated for each --group-commit size, 0 meaning one commit per item.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from items import Item, ItemsDB
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Server did not start on port {port}")
+
+
+def client(args):
+    """Send requests until the end time, return (ok, failed) counts."""
+    url, end, write_ratio, num_items, seed = args
+    rnd = random.Random(seed)
+    ok = failed = 0
+    with httpx.Client(base_url=url, timeout=30) as http:
+        while time.time() < end:
+            if rnd.random() < write_ratio:
+                response = http.post("/add_item", json={"summary": "load"})
+            else:
+                after = rnd.randrange(num_items)
+                response = http.get("/items", params={"after": after, "limit": 50})
+            if response.status_code == 200:
+                ok += 1
+            else:
+                failed += 1
+    return ok, failed
+
+
+def run(workers, group_commit, args, port):
+    with tempfile.TemporaryDirectory() as db_path:
+        db = ItemsDB(db_path, profile="fast")
+        db.add_items(Item(summary=f"item {i}", owner=f"owner {i % 100}")
+                     for i in range(args.items))
+        db.close()
+        env = {**os.environ, "ITEMS_DB_DIR": db_path}
+        server = subprocess.Popen(
+            [sys.executable, "-c", "from items.daemon import main; main()",
+             "serve", "--workers", str(workers), "--port", str(port),
+             "--group-commit", str(group_commit)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_port(port)
+            time.sleep(1)  # let all workers start
+            end = time.time() + args.seconds
+            jobs = [(f"http://127.0.0.1:{port}", end, args.write_ratio, args.items, n)
+                    for n in range(args.clients)]
+            with multiprocessing.Pool(args.clients) as pool:
+                results = pool.map(client, jobs)
+        finally:
+            server.terminate()
+            server.wait()
+    ok = sum(r[0] for r in results)
+    failed = sum(r[1] for r in results)
+    return ok / args.seconds, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--group-commit", type=int, nargs="+", default=[0])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    # The server runs from the current directory, which needs static/.
+    print(f"{'workers':>8} {'group':>6} {'requests/s':>12} {'failed':>8} {'speedup':>8}")
+    base = None
+    for group_commit in args.group_commit:
+        for workers in args.workers:
+            rate, failed = run(workers, group_commit, args, args.port)
+            base = base or rate
+            print(f"{workers:8} {group_commit:6} {rate:12.0f} {failed:8} "
+                  f"{rate / base:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Time the hot paths of ItemsDB, the CLI and the REST API, and compare to a baseline.
+
+    $ python benchmarks/suite.py --items 1000 100000 --output results.json
+    $ python benchmarks/suite.py --items 1000 100000 --baseline results.json
+
+Every benchmark runs --repeat times on a db seeded with the given number of
+items, and the median wall time is reported. The results are written as
+JSON, keyed by "<benchmark>/<items>". With --baseline, benchmarks that got
+slower than the baseline by more than --tolerance are listed, and the
+script exits with status 1.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import items
+from items import Item, ItemsDB
+from items.utils import close_items_dbs
+
+NUM_OWNERS = 100
+
+
+def seed(db, num_items):
+    """Add num_items items in one transaction, every tenth of them done."""
+    db.add_items(
+        Item(summary=f"item {i}", owner=f"owner {i % NUM_OWNERS}",
+             state="done" if i % 10 == 0 else "todo")
+        for i in range(num_items)
+    )
+
+
+def median_time(func, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(i)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def bench_api(db, num_items, repeat):
+    ids = db.list_rows(limit=repeat)
+    ids = [row.id for row in ids]
+    return {
+        "add_item": lambda i: db.add_item(Item(summary=f"new {i}", owner="bench")),
+        "list_items": lambda i: db.list_items(),
+        "list_items_read_only": lambda i: db.list_items(read_only=True),
+        "list_items_owner": lambda i: db.list_items(owner="owner 1"),
+        "list_items_state": lambda i: db.list_items(state="done"),
+        "search": lambda i: db.search(f"item {i}"),
+        "count": lambda i: db.count(),
+        "count_owner": lambda i: db.count(owner="owner 1"),
+        "summary": lambda i: db.summary(),
+        "update_item": lambda i: db.update_item(ids[i], Item(summary=f"updated {i}")),
+        "delete_item": lambda i: db.delete_item(ids[i]),
+    }
+
+
+def bench_cli(repeat):
+    from typer.testing import CliRunner
+
+    runner = CliRunner()
+
+    def run(*args):
+        result = runner.invoke(items.cli.app, list(args))
+        assert result.exit_code == 0, result.output
+
+    return {
+        "cli_count": lambda i: run("count"),
+        "cli_list_owner": lambda i: run("list", "-o", "owner 1"),
+        "cli_add": lambda i: run("add", f"cli {i}"),
+    }
+
+
+def bench_rest(client):
+    def get(url, **headers):
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.text
+        return response.content
+
+    return {
+        "rest_items_page": lambda i: get("/items?limit=100"),
+        "rest_items": lambda i: get("/items"),
+        "rest_items_ndjson": lambda i: get("/items", accept="application/x-ndjson"),
+    }
+
+
+def run(num_items, repeat):
+    """Return a dict mapping benchmark names to median seconds."""
+    from fastapi.testclient import TestClient
+
+    from items.rest_api import app
+
+    results = {}
+    with tempfile.TemporaryDirectory() as db_path:
+        os.environ["ITEMS_DB_DIR"] = db_path
+        db = ItemsDB(db_path)
+        start = time.perf_counter()
+        seed(db, num_items)
+        results["seed"] = time.perf_counter() - start
+        for name, func in bench_api(db, num_items, repeat).items():
+            results[name] = median_time(func, repeat)
+        db.close()
+        for name, func in bench_cli(repeat).items():
+            results[name] = median_time(func, repeat)
+        close_items_dbs()
+        with TestClient(app) as client:
+            for name, func in bench_rest(client).items():
+                results[name] = median_time(func, repeat)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print the change against the baseline, return the regressed keys."""
+    regressions = []
+    print(f"{'benchmark':32} {'baseline ms':>12} {'ms':>10} {'change':>8}")
+    for key, seconds in results.items():
+        if key not in baseline:
+            continue
+        change = seconds / baseline[key] - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:32} {baseline[key] * 1e3:12.3f} {seconds * 1e3:10.3f} "
+              f"{change:+8.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown, 0.25 means 25%%")
+    args = parser.parse_args()
+
+    results = {}
+    for num_items in args.items:
+        for name, seconds in run(num_items, args.repeat).items():
+            results[f"{name}/{num_items}"] = seconds
+    report = {
+        "version": items.__version__,
+        "python": platform.python_version(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} benchmarks regressed.")
+            sys.exit(1)
+    elif not args.output:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,31 @@
 __version__ = "0.1.0"
 
-from items.api import InvalidItemId, Item, ItemsDB
-from items.cli import app
+# The names below are imported on first use (PEP 562), so that commands like
+# `items version` don't pay for importing SQLModel, SQLAlchemy and Typer.
+_lazy_names = {
+    "AsyncItemsDB": "items.api",
+    "InvalidItemId": "items.api",
+    "Item": "items.api",
+    "ItemRow": "items.api",
+    "ItemsDB": "items.api",
+    "app": "items.cli",
+}
+_lazy_modules = {
+    "api", "async_sqldb", "cache", "cli", "metrics", "model", "sqldb", "utils",
+}
+
+
+def __getattr__(name):
+    import importlib
+
+    if name in _lazy_names:
+        value = getattr(importlib.import_module(_lazy_names[name]), name)
+        globals()[name] = value
+        return value
+    if name in _lazy_modules:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_names) | _lazy_modules)
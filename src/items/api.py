@@ -2,14 +2,19 @@
 API for the items project
 """
 import os
+from typing import Iterable, Optional
 
-from .model import Item
-from .sqldb import SQLDB
+from .metrics import instrument_methods
+from .model import Changes, Item, ItemRow
+from .sqldb import SQLDB, fts_query
 
 
 __all__ = [
+    "Changes",
     "Item",
+    "ItemRow",
     "ItemsDB",
+    "AsyncItemsDB",
     "ItemsException",
     "MissingSummary",
     "InvalidItemId",
@@ -28,69 +33,201 @@ class InvalidItemId(ItemsException):
     pass
 
 
+def _item_row(item: Item) -> dict:
+    """Return the fields of a new item, checking that it has a summary."""
+    if not item.summary:
+        raise MissingSummary
+    if item.owner is None:
+        item.owner = ""
+    return {"summary": item.summary, "owner": item.owner, "state": item.state}
+
+
+def _make_changes(since, first, last, rows) -> Changes:
+    """Build Changes from the result of SQLDB.changes()."""
+    last = last or 0
+    if since > last or (first is not None and since < first - 1):
+        return Changes(last, True, [], [])
+    changed, deleted = [], []
+    for seq, item_id, *row in rows:
+        if row[0] is None:
+            deleted.append(item_id)
+        else:
+            changed.append(ItemRow._make(row))
+    return Changes(rows[-1][0] if rows else since, False, changed, deleted)
+
+
+def _summary_dict(rows) -> dict:
+    summary = {}
+    for owner, state, count in rows:
+        summary.setdefault(owner, {})[state] = count
+    return summary
+
+
+def _mods(item_mods: Item) -> dict:
+    """Return the fields of item_mods that are set."""
+    return {
+        k:v
+        for k, v in item_mods.model_dump().items()
+        if v is not None
+        }
+
+
+@instrument_methods
 class ItemsDB:
-    def __init__(self, db_path):
+    """Items in the SQLite db in the directory db_path.
+
+    Several processes can use the same db. Writes wait up to busy_timeout
+    seconds (SQLite's default: 5) for another process to finish writing,
+    and are retried busy_retries times after that, see sqldb.SQLDB.
+    """
+
+    def __init__(self, db_path, pool_size=5, max_overflow=10, profile="default",
+                 busy_timeout=None, busy_retries=5, busy_backoff=0.05):
         self._db_path = db_path
-        self._db = SQLDB(os.path.join(db_path, ".items_db"))
+        self._db = SQLDB(os.path.join(db_path, ".items_db"),
+                         pool_size=pool_size, max_overflow=max_overflow,
+                         profile=profile, busy_timeout=busy_timeout,
+                         busy_retries=busy_retries, busy_backoff=busy_backoff)
 
     def add_item(self, item: Item):
         """Add an item, return the id of the item."""
-        if not item.summary:
-            raise MissingSummary
-        if item.owner is None:
-            item.owner = ""
-        item = Item(summary=item.summary,
-                    owner=item.owner,
-                    state=item.state)  # enable adding same item twice
+        item = Item(**_item_row(item))  # enable adding same item twice
         item_id = self._db.create(item)
         return item_id
 
-    def get_item(self, item_id: int):
-        """Return an item with a corresponding id."""
-        item = self._db.read(item_id)
+    def add_items(self, items: Iterable[Item]):
+        """Add items in one transaction, return the list of their ids."""
+        return self._db.create_many(_item_row(item) for item in items)
+
+    def get_item(self, item_id: int, read_only=False):
+        """Return an item with a corresponding id.
+
+        With read_only, an ItemRow is returned instead of an Item.
+        """
+        item = self._db.read(item_id, read_only=read_only)
         if item is not None:
             return item
         else:
             raise InvalidItemId(item_id)
 
-    def list_items(self, owner=None, state=None):
-        """Return a list of items."""
-        all_items = self._db.read_all()
-        if (owner is not None) and (state is not None):
-            return [
-                item
-                for item in all_items
-                if (item.owner == owner and item.state == state)
-            ]
-        elif owner is not None:
-            return [item for item in all_items if item.owner == owner]
-        elif state is not None:
-            return [item for item in all_items if item.state == state]
-        else:
-            return [item for item in all_items]
+    def list_items(self, owner=None, state=None, after=None, limit=None,
+                   read_only=False):
+        """Return a list of items.
+
+        Items are ordered by id. Pass the id of the last item of a page as
+        `after` to get the next page. With read_only, ItemRow tuples are
+        returned, which take much less time and memory than Item objects.
+        """
+        if read_only:
+            return self._db.read_rows(owner=owner, state=state, after=after,
+                                      limit=limit)
+        if after is None and limit is None:
+            return list(self._db.read_all(owner=owner, state=state))
+        return list(self.iter_items(owner=owner, state=state,
+                                    after=after, limit=limit))
+
+    def list_rows(self, owner=None, state=None, after=None, limit=None):
+        """Return a list of ItemRow tuples, see list_items()."""
+        return self.list_items(owner=owner, state=state, after=after,
+                               limit=limit, read_only=True)
+
+    def iter_items(self, owner=None, state=None, after=None, limit=None,
+                   batch_size=1000, read_only=False):
+        """Yield items ordered by id without loading all of them at once."""
+        return self._db.iter_all(owner=owner, state=state, after=after,
+                                 limit=limit, batch_size=batch_size,
+                                 read_only=read_only)
 
-    def count(self):
+    def search(self, query: str, owner=None, state=None, limit=20):
+        """Return ItemRow tuples of items whose summary matches query.
+
+        Every word of query must start a word of the summary. The best
+        matches come first.
+        """
+        match = fts_query(query)
+        if match is None:
+            return []
+        return self._db.search(match, owner=owner, state=state, limit=limit)
+
+    def count(self, owner=None, state=None):
         """Return the number of items in the db."""
-        return self._db.count()
+        return self._db.count(owner=owner, state=state)
+
+    def count_by_state(self, owner=None):
+        """Return a dict mapping each state to its number of items."""
+        return self._db.count_by_state(owner=owner)
+
+    def summary(self, owner=None):
+        """Return a dict mapping each owner to a dict of counts per state.
+
+        The counts are kept up to date by the db on every write, so this
+        takes no longer with many items than with a few.
+        """
+        return _summary_dict(self._db.summary(owner=owner))
+
+    def data_version(self):
+        """Return a (version, modified) tuple for the items.
+
+        version grows with every write, modified is the time of the last
+        write in seconds since the epoch.
+        """
+        return self._db.version()
+
+    def changes(self, since=0, limit=None):
+        """Return the items changed after the change number since.
+
+        Every write to an item adds a change with the next sequence number
+        to a log, which keeps the last sqldb.CHANGE_LOG_SIZE changes. Pass
+        the seq of the result as since to get the following changes.
+        """
+        return _make_changes(since, *self._db.changes(since, limit))
+
+    def last_change(self):
+        """Return the sequence number of the last change, 0 if none."""
+        return self._db.last_change()
 
     def update_item(self, item_id: int, item_mods: Item):
         """Update an item with modifications."""
-        mods = {
-            k:v
-            for k, v in item_mods.model_dump().items()
-            if v is not None
-            }
-        rowcount = self._db.update(item_id, mods)
+        rowcount = self._db.update(item_id, _mods(item_mods))
         if rowcount == 0:
             raise InvalidItemId(item_id)
 
-    def start(self, item_id: int):
-        """Set an item state to in progress."""
-        self.update_item(item_id, Item(state="in progress"))
+    def update_items(self, item_ids: Iterable[int], item_mods: Item):
+        """Apply the same modifications to several items in one transaction."""
+        item_ids = list(item_ids)
+        found = self._db.update_many(item_ids, _mods(item_mods))
+        if len(found) < len(set(item_ids)):
+            raise InvalidItemId(sorted(set(item_ids) - set(found)))
 
-    def finish(self, item_id: int):
-        """Set an item state to done."""
-        self.update_item(item_id, Item(state="done"))
+    def transition(self, item_id: int, state: str, from_state=None):
+        """Set the state of an item, if it is in from_state.
+
+        from_state is a state or a list of states, None matches any state.
+        The check and the update are one statement, so concurrent callers
+        cannot both succeed. Return whether the state was set.
+        """
+        if self._db.transition(state, ids=[item_id], from_state=from_state):
+            return True
+        if self._db.read(item_id, read_only=True) is None:
+            raise InvalidItemId(item_id)
+        return False
+
+    def transition_items(self, state: str, from_state=None, owner=None,
+                         item_ids: Optional[Iterable[int]] = None):
+        """Set the state of all items in from_state, return the changed ids.
+
+        Restrict to the items of owner and to item_ids if given.
+        """
+        return self._db.transition(state, ids=item_ids, from_state=from_state,
+                                   owner=owner)
+
+    def start(self, item_id: int, from_state=None):
+        """Set an item state to in progress, see transition()."""
+        return self.transition(item_id, "in progress", from_state)
+
+    def finish(self, item_id: int, from_state=None):
+        """Set an item state to done, see transition()."""
+        return self.transition(item_id, "done", from_state)
 
     def delete_item(self, item_id: int):
         """Remove an item from db with a given item id."""
@@ -98,12 +235,201 @@ class ItemsDB:
         if rowcount == 0:
             raise InvalidItemId(item_id)
 
+    def delete_items(self, item_ids: Iterable[int]):
+        """Remove several items from the db in one transaction."""
+        item_ids = list(item_ids)
+        found = self._db.delete_many(item_ids)
+        if len(found) < len(set(item_ids)):
+            raise InvalidItemId(sorted(set(item_ids) - set(found)))
+
     def delete_all(self):
         """Remove all items from the db."""
         self._db.delete_all()
 
+    def transaction(self):
+        """Return a context manager that runs all writes in one transaction.
+
+        The writes are committed together at the end of the with block, or
+        not at all if it raises.
+        """
+        return self._db.transaction()
+
     def close(self):
-        pass
+        """Close all connections to the db."""
+        self._db.close()
+
+    def path(self):
+        return self._db_path
+
+
+@instrument_methods
+class AsyncItemsDB:
+    """Like ItemsDB, but with coroutines on top of an async SQLite driver.
+
+    Call `await open()` once before using it.
+
+    With group_commit_size, add_item() calls from concurrent tasks are
+    inserted together, up to group_commit_size items per transaction and
+    waiting at most group_commit_delay seconds for more items, see
+    group_commit.GroupCommit. This trades a little latency for far fewer
+    commits when many clients add items at once.
+    """
+
+    def __init__(self, db_path, pool_size=5, max_overflow=10, profile="default",
+                 busy_timeout=None, busy_retries=5, busy_backoff=0.05,
+                 group_commit_size=0, group_commit_delay=0.005):
+        # SQLAlchemy's asyncio support is slow to import, so only do it here.
+        from .async_sqldb import AsyncSQLDB
+
+        self._db_path = db_path
+        self._db = AsyncSQLDB(os.path.join(db_path, ".items_db"),
+                              pool_size=pool_size, max_overflow=max_overflow,
+                              profile=profile, busy_timeout=busy_timeout,
+                              busy_retries=busy_retries, busy_backoff=busy_backoff)
+        self._group_commit = None
+        if group_commit_size > 1:
+            from .group_commit import GroupCommit
+
+            self._group_commit = GroupCommit(self._db.create_many,
+                                             group_commit_size, group_commit_delay)
+
+    async def open(self):
+        """Create the tables and indexes if needed."""
+        await self._db.open()
+
+    async def add_item(self, item: Item):
+        """Add an item, return the id of the item."""
+        if self._group_commit is not None:
+            return await self._group_commit.add(_item_row(item))
+        item = Item(**_item_row(item))  # enable adding same item twice
+        return await self._db.create(item)
+
+    async def add_items(self, items: Iterable[Item]):
+        """Add items in one transaction, return the list of their ids."""
+        return await self._db.create_many(_item_row(item) for item in items)
+
+    async def get_item(self, item_id: int, read_only=False):
+        """Return an item with a corresponding id."""
+        item = await self._db.read(item_id, read_only=read_only)
+        if item is not None:
+            return item
+        else:
+            raise InvalidItemId(item_id)
+
+    async def list_items(self, owner=None, state=None, after=None, limit=None,
+                         read_only=False):
+        """Return a list of items ordered by id."""
+        if read_only:
+            return await self._db.read_rows(owner=owner, state=state,
+                                            after=after, limit=limit)
+        if after is None and limit is None:
+            return list(await self._db.read_all(owner=owner, state=state))
+        return [
+            item
+            async for item in self.iter_items(owner=owner, state=state,
+                                              after=after, limit=limit)
+        ]
+
+    async def list_rows(self, owner=None, state=None, after=None, limit=None):
+        """Return a list of ItemRow tuples."""
+        return await self.list_items(owner=owner, state=state, after=after,
+                                     limit=limit, read_only=True)
+
+    def iter_items(self, owner=None, state=None, after=None, limit=None,
+                   batch_size=1000, read_only=False):
+        """Asynchronously yield items ordered by id."""
+        return self._db.iter_all(owner=owner, state=state, after=after,
+                                 limit=limit, batch_size=batch_size,
+                                 read_only=read_only)
+
+    async def search(self, query: str, owner=None, state=None, limit=20):
+        """Return ItemRow tuples of items whose summary matches query."""
+        match = fts_query(query)
+        if match is None:
+            return []
+        return await self._db.search(match, owner=owner, state=state, limit=limit)
+
+    async def count(self, owner=None, state=None):
+        """Return the number of items in the db."""
+        return await self._db.count(owner=owner, state=state)
+
+    async def count_by_state(self, owner=None):
+        """Return a dict mapping each state to its number of items."""
+        return await self._db.count_by_state(owner=owner)
+
+    async def summary(self, owner=None):
+        """Return a dict mapping each owner to a dict of counts per state."""
+        return _summary_dict(await self._db.summary(owner=owner))
+
+    async def data_version(self):
+        """Return a (version, modified) tuple for the items."""
+        return await self._db.version()
+
+    async def changes(self, since=0, limit=None):
+        """Return the items changed after the change number since."""
+        return _make_changes(since, *await self._db.changes(since, limit))
+
+    async def last_change(self):
+        """Return the sequence number of the last change, 0 if none."""
+        return await self._db.last_change()
+
+    async def update_item(self, item_id: int, item_mods: Item):
+        """Update an item with modifications."""
+        rowcount = await self._db.update(item_id, _mods(item_mods))
+        if rowcount == 0:
+            raise InvalidItemId(item_id)
+
+    async def update_items(self, item_ids: Iterable[int], item_mods: Item):
+        """Apply the same modifications to several items in one transaction."""
+        item_ids = list(item_ids)
+        found = await self._db.update_many(item_ids, _mods(item_mods))
+        if len(found) < len(set(item_ids)):
+            raise InvalidItemId(sorted(set(item_ids) - set(found)))
+
+    async def transition(self, item_id: int, state: str, from_state=None):
+        """Set the state of an item if it is in from_state, see ItemsDB."""
+        if await self._db.transition(state, ids=[item_id], from_state=from_state):
+            return True
+        if await self._db.read(item_id, read_only=True) is None:
+            raise InvalidItemId(item_id)
+        return False
+
+    async def transition_items(self, state: str, from_state=None, owner=None,
+                               item_ids: Optional[Iterable[int]] = None):
+        """Set the state of all items in from_state, return the changed ids."""
+        return await self._db.transition(state, ids=item_ids,
+                                         from_state=from_state, owner=owner)
+
+    async def start(self, item_id: int, from_state=None):
+        """Set an item state to in progress."""
+        return await self.transition(item_id, "in progress", from_state)
+
+    async def finish(self, item_id: int, from_state=None):
+        """Set an item state to done."""
+        return await self.transition(item_id, "done", from_state)
+
+    async def delete_item(self, item_id: int):
+        """Remove an item from db with a given item id."""
+        rowcount = await self._db.delete(item_id)
+        if rowcount == 0:
+            raise InvalidItemId(item_id)
+
+    async def delete_items(self, item_ids: Iterable[int]):
+        """Remove several items from the db in one transaction."""
+        item_ids = list(item_ids)
+        found = await self._db.delete_many(item_ids)
+        if len(found) < len(set(item_ids)):
+            raise InvalidItemId(sorted(set(item_ids) - set(found)))
+
+    async def delete_all(self):
+        """Remove all items from the db."""
+        await self._db.delete_all()
+
+    async def close(self):
+        """Write the items still queued, and close all connections to the db."""
+        if self._group_commit is not None:
+            await self._group_commit.flush()
+        await self._db.close()
 
     def path(self):
         return self._db_path
@@ -0,0 +1,262 @@
+"""
+Async DB for the items project
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from itertools import count
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import func, insert, select, update, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .metrics import instrument_engine
+from .model import Item, ItemChange, ItemRow, ItemsVersion
+from .sqldb import (
+    _bump_version,
+    _change_range,
+    _changes,
+    _chunks,
+    _count,
+    _count_by_state,
+    _filter,
+    _search,
+    _select,
+    _summary,
+    _transition,
+    _unique,
+    backoff,
+    create_schema,
+    is_busy,
+    listen_pragmas,
+)
+
+
+class AsyncSQLDB:
+    """Like SQLDB, but on top of aiosqlite."""
+
+    def __init__(self, db_file_prefix: str, pool_size=5, max_overflow=10,
+                 profile="default", busy_timeout=None, busy_retries=5,
+                 busy_backoff=0.05):
+        self._db = create_async_engine(
+            f"sqlite+aiosqlite:///{db_file_prefix}.db",
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+        )
+        self.busy_retries = busy_retries
+        self.busy_backoff = busy_backoff
+        listen_pragmas(self._db.sync_engine, profile, busy_timeout)
+        instrument_engine(self._db.sync_engine)
+        self._open_lock = asyncio.Lock()
+        self._opened = False
+
+    async def open(self):
+        async with self._open_lock:
+            if not self._opened:
+                async with self._db.begin() as connection:
+                    await connection.run_sync(create_schema)
+                self._opened = True
+
+    @asynccontextmanager
+    async def _write_session(self, **kwargs):
+        """Return a session in a write transaction, see SQLDB."""
+        async with AsyncSession(self._db, **kwargs) as session:
+            for attempt in count():
+                try:
+                    connection = await session.connection()
+                    await connection.exec_driver_sql("BEGIN IMMEDIATE")
+                    break
+                except OperationalError as e:
+                    await session.rollback()
+                    if not is_busy(e) or attempt >= self.busy_retries:
+                        raise
+                await asyncio.sleep(backoff(attempt, self.busy_backoff))
+            yield session
+
+    async def create(self, item: Item) -> int:
+        # Expiring item on commit would reload its id with blocking IO.
+        async with self._write_session(expire_on_commit=False) as session:
+            session.add(item)
+            await session.exec(_bump_version())
+            await session.commit()
+            return item.id
+
+    async def create_many(self, rows) -> list:
+        """Insert dicts of item fields in one transaction, return their ids."""
+        ids = []
+        async with self._write_session() as session:
+            for chunk in _chunks(rows):
+                statement = insert(Item).returning(
+                    Item.id, sort_by_parameter_order=True
+                )
+                result = await session.exec(statement, params=chunk)
+                ids.extend(result.scalars())
+            await session.exec(_bump_version())
+            await session.commit()
+        return ids
+
+    async def read(self, id: int, read_only=False):
+        async with AsyncSession(self._db) as session:
+            statement = _select(read_only).where(Item.id == id)
+            result = await session.exec(statement)
+            item = result.first()
+            if read_only and item is not None:
+                return ItemRow._make(item)
+            return item
+
+    async def read_all(self, owner=None, state=None):
+        async with AsyncSession(self._db) as session:
+            statement = _filter(select(Item), owner, state).order_by(Item.id)
+            result = await session.exec(statement)
+            return result.fetchall()
+
+    async def read_rows(self, owner=None, state=None, after=None, limit=None):
+        """Return ItemRow tuples instead of items."""
+        statement = _filter(_select(read_only=True), owner, state)
+        if after is not None:
+            statement = statement.where(Item.id > after)
+        statement = statement.order_by(Item.id).limit(limit)
+        async with AsyncSession(self._db) as session:
+            result = await session.exec(statement)
+            return list(map(ItemRow._make, result))
+
+    async def search(self, query, owner=None, state=None, limit=None) -> list:
+        """Return ItemRow tuples of the items matching an FTS5 query."""
+        async with AsyncSession(self._db) as session:
+            result = await session.exec(_search(query, owner, state, limit))
+            return list(map(ItemRow._make, result))
+
+    async def iter_all(self, owner=None, state=None, after=None, limit=None,
+                       batch_size=1000, read_only=False):
+        """Yield items ordered by id, fetching batch_size rows at a time."""
+        statement = _filter(_select(read_only), owner, state)
+        if after is not None:
+            statement = statement.where(Item.id > after)
+        statement = statement.order_by(Item.id).limit(limit)
+        statement = statement.execution_options(yield_per=batch_size)
+        async with AsyncSession(self._db) as session:
+            if read_only:
+                result = await session.stream(statement)
+                async for row in result:
+                    yield ItemRow._make(row)
+            else:
+                result = await session.stream_scalars(statement)
+                async for item in result:
+                    yield item
+
+    async def update(self, id: int, mods) -> None:
+        async with self._write_session() as session:
+            statement = update(Item).where(Item.id==id).values(**mods)
+            up = await session.exec(statement)
+            await session.exec(_bump_version())
+            await session.commit()
+            return up.rowcount
+
+    async def update_many(self, ids, mods) -> list:
+        """Update items in one transaction, return the ids that were found.
+
+        Nothing is changed if some of the ids are not found.
+        """
+        ids = _unique(ids)
+        found = []
+        async with self._write_session() as session:
+            for chunk in _chunks(ids):
+                statement = (
+                    update(Item).where(Item.id.in_(chunk)).values(**mods)
+                    .returning(Item.id)
+                )
+                result = await session.exec(statement)
+                found.extend(result.scalars())
+            if len(found) == len(set(ids)):
+                await session.exec(_bump_version())
+                await session.commit()
+        return found
+
+    async def transition(self, state, ids=None, from_state=None, owner=None) -> list:
+        """Set the state of the items currently in from_state, in one UPDATE."""
+        statement = _transition(state, from_state, owner)
+        found = []
+        async with self._write_session() as session:
+            if ids is None:
+                result = await session.exec(statement)
+                found.extend(result.scalars())
+            else:
+                for chunk in _chunks(_unique(ids)):
+                    result = await session.exec(statement.where(Item.id.in_(chunk)))
+                    found.extend(result.scalars())
+            if found:
+                await session.exec(_bump_version())
+                await session.commit()
+        return found
+
+    async def delete_many(self, ids) -> list:
+        """Delete items in one transaction, return the ids that were found.
+
+        Nothing is deleted if some of the ids are not found.
+        """
+        ids = _unique(ids)
+        found = []
+        async with self._write_session() as session:
+            for chunk in _chunks(ids):
+                statement = delete(Item).where(Item.id.in_(chunk)).returning(Item.id)
+                result = await session.exec(statement)
+                found.extend(result.scalars())
+            if len(found) == len(set(ids)):
+                await session.exec(_bump_version())
+                await session.commit()
+        return found
+
+    async def delete(self, id: int) -> None:
+        async with self._write_session() as session:
+            statement = delete(Item).where(Item.id==id)
+            crs = await session.exec(statement)
+            await session.exec(_bump_version())
+            await session.commit()
+            return crs.rowcount
+
+    async def delete_all(self) -> None:
+        async with self._write_session() as session:
+            statement = delete(Item)
+            crs = await session.exec(statement)
+            await session.exec(_bump_version())
+            await session.commit()
+            return crs.rowcount
+
+    async def count(self, owner=None, state=None) -> int:
+        async with AsyncSession(self._db) as session:
+            result = await session.exec(_count(owner, state))
+            return result.one()
+
+    async def version(self) -> tuple:
+        """Return the number of writes so far and the time of the last one."""
+        async with AsyncSession(self._db) as session:
+            row = await session.get(ItemsVersion, 1)
+            return row.version, row.modified
+
+    async def changes(self, since=0, limit=None) -> tuple:
+        """Return the first and last seq of the change log, and the rows
+        of the items changed after since.
+        """
+        async with AsyncSession(self._db) as session:
+            first, last = (await session.exec(_change_range())).one()
+            result = await session.exec(_changes(since, limit))
+            return first, last, result.all()
+
+    async def last_change(self) -> int:
+        async with AsyncSession(self._db) as session:
+            result = await session.exec(select(func.max(ItemChange.seq)))
+            return result.one() or 0
+
+    async def count_by_state(self, owner=None) -> dict:
+        async with AsyncSession(self._db) as session:
+            result = await session.exec(_count_by_state(owner))
+            return dict(result.all())
+
+    async def summary(self, owner=None) -> list:
+        """Return (owner, state, count) tuples ordered by owner and state."""
+        async with AsyncSession(self._db) as session:
+            result = await session.exec(_summary(owner))
+            return result.all()
+
+    async def close(self):
+        await self._db.dispose()
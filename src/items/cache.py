@@ -0,0 +1,342 @@
+"""
+Read cache for the items project
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .api import AsyncItemsDB, ItemsDB
+
+
+__all__ = [
+    "ItemsCache",
+    "CachedItemsDB",
+    "AsyncCachedItemsDB",
+]
+
+
+MISSING = object()
+
+
+class ItemsCache:
+    """LRU cache with a time to live for the results of ItemsDB reads.
+
+    Keys are tuples whose first element is the kind of read: ("item", id, ...)
+    for single items, and e.g. ("list", owner, state, ...) for everything
+    that depends on more than one item.
+    """
+
+    def __init__(self, maxsize=1024, ttl=5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key, or MISSING."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, item_ids=()):
+        """Drop the given items and all results that span several items."""
+        with self._lock:
+            item_ids = set(item_ids)
+            for key in list(self._entries):
+                if key[0] != "item" or key[1] in item_ids:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+class CachedItemsDB(ItemsDB):
+    """ItemsDB that caches get_item, list_items, count and other reads.
+
+    iter_items with read_only reads its pages through the list_items cache,
+    which serves `items list` in the daemon and the HTML /items page.
+
+    Writes through this object invalidate the affected entries. Writes by
+    other processes are only seen once the entries expire after ttl seconds,
+    or once data_version() returns a new version: the version last returned
+    is part of every key, so a caller that checks it first, like the REST
+    API computing its ETag, never gets results cached under an older one.
+    """
+
+    def __init__(self, db_path, cache_size=1024, cache_ttl=5.0, **kwargs):
+        super().__init__(db_path, **kwargs)
+        self.cache = ItemsCache(cache_size, cache_ttl)
+        self._version = None
+
+    def data_version(self):
+        version = super().data_version()
+        if version[0] != self._version:
+            self._version = version[0]
+            self.cache.clear()
+        return version
+
+    def _cached(self, key, read, *args):
+        key = (*key, self._version)
+        value = self.cache.get(key)
+        if value is MISSING:
+            value = read(*args)
+            self.cache.put(key, value)
+        return value
+
+    def get_item(self, item_id: int, read_only=False):
+        return self._cached(("item", item_id, read_only),
+                            super().get_item, item_id, read_only)
+
+    def list_items(self, owner=None, state=None, after=None, limit=None,
+                   read_only=False):
+        return list(self._cached(("list", owner, state, after, limit, read_only),
+                                 super().list_items,
+                                 owner, state, after, limit, read_only))
+
+    def iter_items(self, owner=None, state=None, after=None, limit=None,
+                   batch_size=1000, read_only=False):
+        if not read_only:
+            # list_items() of Item objects is built on iter_items().
+            return super().iter_items(owner, state, after, limit, batch_size)
+        return self._iter_pages(owner, state, after, limit, batch_size)
+
+    def _iter_pages(self, owner, state, after, limit, batch_size):
+        while limit is None or limit > 0:
+            size = batch_size if limit is None else min(batch_size, limit)
+            page = self.list_items(owner, state, after, size, read_only=True)
+            yield from page
+            if len(page) < size:
+                return
+            after = page[-1].id
+            if limit is not None:
+                limit -= size
+
+    def search(self, query: str, owner=None, state=None, limit=20):
+        return list(self._cached(("search", query, owner, state, limit),
+                                 super().search, query, owner, state, limit))
+
+    def count(self, owner=None, state=None):
+        return self._cached(("count", owner, state), super().count, owner, state)
+
+    def count_by_state(self, owner=None):
+        return dict(self._cached(("count_by_state", owner),
+                                 super().count_by_state, owner))
+
+    def summary(self, owner=None):
+        summary = self._cached(("summary", owner), super().summary, owner)
+        return {owner: dict(counts) for owner, counts in summary.items()}
+
+    def add_item(self, item):
+        try:
+            return super().add_item(item)
+        finally:
+            self.cache.invalidate()
+
+    def add_items(self, items):
+        try:
+            return super().add_items(items)
+        finally:
+            self.cache.invalidate()
+
+    def update_item(self, item_id: int, item_mods):
+        try:
+            super().update_item(item_id, item_mods)
+        finally:
+            self.cache.invalidate([item_id])
+
+    def update_items(self, item_ids, item_mods):
+        item_ids = list(item_ids)
+        try:
+            super().update_items(item_ids, item_mods)
+        finally:
+            self.cache.invalidate(item_ids)
+
+    def transition(self, item_id: int, state: str, from_state=None):
+        try:
+            return super().transition(item_id, state, from_state)
+        finally:
+            self.cache.invalidate([item_id])
+
+    def transition_items(self, state: str, from_state=None, owner=None,
+                         item_ids=None):
+        ids = []
+        try:
+            ids = super().transition_items(state, from_state, owner, item_ids)
+            return ids
+        finally:
+            self.cache.invalidate(ids)
+
+    def delete_item(self, item_id: int):
+        try:
+            super().delete_item(item_id)
+        finally:
+            self.cache.invalidate([item_id])
+
+    def delete_items(self, item_ids):
+        item_ids = list(item_ids)
+        try:
+            super().delete_items(item_ids)
+        finally:
+            self.cache.invalidate(item_ids)
+
+    def delete_all(self):
+        try:
+            super().delete_all()
+        finally:
+            self.cache.clear()
+
+    @contextmanager
+    def transaction(self):
+        # Reads inside the transaction may cache writes that get rolled back.
+        try:
+            with super().transaction():
+                yield
+        finally:
+            self.cache.clear()
+
+
+class AsyncCachedItemsDB(AsyncItemsDB):
+    """AsyncItemsDB that caches reads like CachedItemsDB."""
+
+    def __init__(self, db_path, cache_size=1024, cache_ttl=5.0, **kwargs):
+        super().__init__(db_path, **kwargs)
+        self.cache = ItemsCache(cache_size, cache_ttl)
+        self._version = None
+
+    async def data_version(self):
+        version = await super().data_version()
+        if version[0] != self._version:
+            self._version = version[0]
+            self.cache.clear()
+        return version
+
+    async def _cached(self, key, read, *args):
+        key = (*key, self._version)
+        value = self.cache.get(key)
+        if value is MISSING:
+            value = await read(*args)
+            self.cache.put(key, value)
+        return value
+
+    async def get_item(self, item_id: int, read_only=False):
+        return await self._cached(("item", item_id, read_only),
+                                  super().get_item, item_id, read_only)
+
+    async def list_items(self, owner=None, state=None, after=None, limit=None,
+                         read_only=False):
+        return list(await self._cached(("list", owner, state, after, limit, read_only),
+                                       super().list_items,
+                                       owner, state, after, limit, read_only))
+
+    def iter_items(self, owner=None, state=None, after=None, limit=None,
+                   batch_size=1000, read_only=False):
+        if not read_only:
+            return super().iter_items(owner, state, after, limit, batch_size)
+        return self._iter_pages(owner, state, after, limit, batch_size)
+
+    async def _iter_pages(self, owner, state, after, limit, batch_size):
+        while limit is None or limit > 0:
+            size = batch_size if limit is None else min(batch_size, limit)
+            page = await self.list_items(owner, state, after, size, read_only=True)
+            for row in page:
+                yield row
+            if len(page) < size:
+                return
+            after = page[-1].id
+            if limit is not None:
+                limit -= size
+
+    async def search(self, query: str, owner=None, state=None, limit=20):
+        return list(await self._cached(("search", query, owner, state, limit),
+                                       super().search, query, owner, state, limit))
+
+    async def count(self, owner=None, state=None):
+        return await self._cached(("count", owner, state), super().count, owner, state)
+
+    async def count_by_state(self, owner=None):
+        return dict(await self._cached(("count_by_state", owner),
+                                       super().count_by_state, owner))
+
+    async def summary(self, owner=None):
+        summary = await self._cached(("summary", owner), super().summary, owner)
+        return {owner: dict(counts) for owner, counts in summary.items()}
+
+    async def add_item(self, item):
+        try:
+            return await super().add_item(item)
+        finally:
+            self.cache.invalidate()
+
+    async def add_items(self, items):
+        try:
+            return await super().add_items(items)
+        finally:
+            self.cache.invalidate()
+
+    async def update_item(self, item_id: int, item_mods):
+        try:
+            await super().update_item(item_id, item_mods)
+        finally:
+            self.cache.invalidate([item_id])
+
+    async def update_items(self, item_ids, item_mods):
+        item_ids = list(item_ids)
+        try:
+            await super().update_items(item_ids, item_mods)
+        finally:
+            self.cache.invalidate(item_ids)
+
+    async def transition(self, item_id: int, state: str, from_state=None):
+        try:
+            return await super().transition(item_id, state, from_state)
+        finally:
+            self.cache.invalidate([item_id])
+
+    async def transition_items(self, state: str, from_state=None, owner=None,
+                               item_ids=None):
+        ids = []
+        try:
+            ids = await super().transition_items(state, from_state, owner, item_ids)
+            return ids
+        finally:
+            self.cache.invalidate(ids)
+
+    async def delete_item(self, item_id: int):
+        try:
+            await super().delete_item(item_id)
+        finally:
+            self.cache.invalidate([item_id])
+
+    async def delete_items(self, item_ids):
+        item_ids = list(item_ids)
+        try:
+            await super().delete_items(item_ids)
+        finally:
+            self.cache.invalidate(item_ids)
+
+    async def delete_all(self):
+        try:
+            await super().delete_all()
+        finally:
+            self.cache.clear()
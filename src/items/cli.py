@@ -1,13 +1,20 @@
 """Command Line Interface (CLI) for the items project."""
-from io import StringIO
+import contextlib
+import csv
+import io
+import json
+import shlex
+from itertools import islice
+from pathlib import Path
 from typing import List
 
-import rich
 import typer
-from rich.table import Table
 
 import items
-from items.utils import items_db
+from items.utils import get_path, items_db
+
+# items.api (and with it SQLModel) and rich.table are only imported by the
+# commands that need them, which keeps `items version` and `items config` fast.
 
 
 app = typer.Typer(add_completion=False)
@@ -27,6 +34,43 @@ def add(summary: List[str], owner: str = typer.Option(None, "-o", "--owner")):
         db.add_item(items.Item(summary=summary, owner=owner, state="todo"))
 
 
+def _read_items(path: Path, fmt: str):
+    """Yield items from a CSV or JSONL file without reading it all at once."""
+    with path.open(newline="") as f:
+        if fmt == "csv":
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            yield items.Item(
+                summary=row.get("summary"),
+                owner=row.get("owner") or None,
+                state=row.get("state") or "todo",
+            )
+
+
+@app.command("import")
+def import_items(
+    path: Path = typer.Argument(..., exists=True, dir_okay=False),
+    fmt: str = typer.Option(None, "-f", "--format", help="csv or jsonl"),
+):
+    """Add the items of a CSV or JSONL file to the db."""
+    from items.api import MissingSummary
+
+    if fmt is None:
+        fmt = "csv" if path.suffix.lower() == ".csv" else "jsonl"
+    with items_db() as db:
+        try:
+            ids = db.add_items(_read_items(path, fmt))
+        except MissingSummary:
+            print("Error: Missing summary, nothing imported.")
+        except (ValueError, csv.Error) as e:
+            # json.JSONDecodeError and UnicodeDecodeError are ValueErrors.
+            print(f"Error: Invalid {fmt} file: {e}, nothing imported.")
+        else:
+            print(f"Imported {len(ids)} items.")
+
+
 @app.command()
 def delete(item_id: int):
     """Remove an item in the db with a given id."""
@@ -37,6 +81,19 @@ def delete(item_id: int):
             print(f"Error: Invalid item id {item_id}")
 
 
+LIST_CHUNK_SIZE = 1000
+
+
+def _items_table(show_header=True, widths=(0, 0, 0, 0)):
+    import rich.box
+    from rich.table import Table
+
+    table = Table(box=rich.box.SIMPLE, show_header=show_header, show_edge=False)
+    for name, width in zip(("ID", "state", "owner", "summary"), widths):
+        table.add_column(name, min_width=width)
+    return table
+
+
 @app.command("list")
 def list_items(
     owner: str = typer.Option(None, "-o", "--owner"),
@@ -45,19 +102,49 @@ def list_items(
     """
     List the items in the db.
     """
+    import rich
+    from rich.cells import cell_len
+    from rich.padding import Padding
+
     with items_db() as db:
-        the_items = db.list_items(owner=owner, state=state)
-        table = Table(box=rich.box.SIMPLE)
-        table.add_column("ID")
-        table.add_column("state")
-        table.add_column("owner")
-        table.add_column("summary")
-        for t in the_items:
+        the_items = db.iter_items(owner=owner, state=state,
+                                  batch_size=LIST_CHUNK_SIZE, read_only=True)
+        # Print the table in chunks, so that the first rows appear before all
+        # items are read. Later chunks reuse the column widths seen so far.
+        print()
+        widths = [cell_len(name) for name in ("ID", "state", "owner", "summary")]
+        table = _items_table()
+        for i, t in enumerate(the_items, 1):
             owner = "" if t.owner is None else t.owner
-            table.add_row(str(t.id), t.state, owner, t.summary)
-        out = StringIO()
-        rich.print(table, file=out)
-        print(out.getvalue())
+            row = (str(t.id), t.state, owner, t.summary)
+            widths = [max(w, cell_len(cell)) for w, cell in zip(widths, row)]
+            table.add_row(*row)
+            if i % LIST_CHUNK_SIZE == 0:
+                rich.print(Padding(table, (0, 1), expand=False))
+                table = _items_table(show_header=False, widths=widths)
+        if table.row_count or table.show_header:
+            rich.print(Padding(table, (0, 1), expand=False))
+
+
+@app.command()
+def search(
+    query: List[str],
+    owner: str = typer.Option(None, "-o", "--owner"),
+    state: str = typer.Option(None, "-s", "--state"),
+    limit: int = typer.Option(20, "-n", "--limit"),
+):
+    """List the items whose summary matches the query, best matches first."""
+    import rich
+    from rich.padding import Padding
+
+    with items_db() as db:
+        the_items = db.search(" ".join(query), owner=owner, state=state,
+                              limit=limit)
+    print()
+    table = _items_table()
+    for t in the_items:
+        table.add_row(str(t.id), t.state, t.owner or "", t.summary)
+    rich.print(Padding(table, (0, 1), expand=False))
 
 
 @app.command()
@@ -98,15 +185,228 @@ def finish(item_id: int):
 @app.command()
 def config():
     """List the path to the Items db."""
-    with items_db() as db:
-        print(db.path())
+    print(get_path())
 
 
 @app.command()
-def count():
+def count(
+    owner: str = typer.Option(None, "-o", "--owner"),
+    state: str = typer.Option(None, "-s", "--state"),
+    by_state: bool = typer.Option(False, "--by-state"),
+):
     """Return number of items in db."""
     with items_db() as db:
-        print(db.count())
+        if by_state:
+            for state_, num in db.count_by_state(owner=owner).items():
+                print(f"{state_}: {num}")
+        else:
+            print(db.count(owner=owner, state=state))
+
+
+@app.command()
+def summary(owner: str = typer.Option(None, "-o", "--owner")):
+    """Show the number of items per owner and state."""
+    import rich
+    import rich.box
+    from rich.table import Table
+
+    with items_db() as db:
+        counts = db.summary(owner=owner)
+    states = sorted({state for by_state in counts.values() for state in by_state})
+    table = Table(box=rich.box.SIMPLE, show_footer=len(counts) > 1)
+    table.add_column("owner", footer="total")
+    for state in states:
+        total = sum(by_state.get(state, 0) for by_state in counts.values())
+        table.add_column(state, justify="right", footer=str(total))
+    table.add_column("total", justify="right",
+                     footer=str(sum(sum(c.values()) for c in counts.values())))
+    for owner_, by_state in counts.items():
+        table.add_row(owner_, *[str(by_state.get(state, 0)) for state in states],
+                      str(sum(by_state.values())))
+    rich.print(table)
+
+
+def _stats_table(kind, histograms):
+    from rich.table import Table
+
+    table = Table()
+    for name in (kind, "calls", "total ms", "mean ms", "max ms"):
+        table.add_column(name, justify="left" if name == kind else "right")
+    for name, h in sorted(histograms.items()):
+        table.add_row(name, str(h.count), f"{h.sum * 1e3:.2f}",
+                      f"{h.sum / h.count * 1e3:.3f}", f"{h.max * 1e3:.3f}")
+    return table
+
+
+@app.command()
+def stats(
+    prometheus: bool = typer.Option(False, "--prometheus",
+                                    help="Print in Prometheus text format."),
+):
+    """Show the SQL statement and ItemsDB call timings of this process.
+
+    Run `items daemon` first to see the timings of all commands since it
+    started.
+    """
+    import rich
+
+    from items.metrics import METRICS, to_prometheus
+
+    if prometheus:
+        print(to_prometheus(), end="")
+        return
+    if not (METRICS.statements or METRICS.methods):
+        print("No statements recorded.")
+        return
+    rich.print(_stats_table("statement", METRICS.statements))
+    if METRICS.failed_statements:
+        failed = {f"{kind} ({error})": h
+                  for (kind, error), h in METRICS.failed_statements.items()}
+        rich.print(_stats_table("failed statement", failed))
+    rich.print(_stats_table("method", METRICS.methods))
+    print(f"slow statements: {METRICS.slow_statements}")
+
+
+BATCH_COMMANDS = ("add", "update", "start", "finish", "delete")
+
+
+def _run_batch_line(group, line):
+    """Run one line of a batch with the command's own argument parsing.
+
+    Return what the command printed, or "ok" if it printed nothing. Errors
+    of the command line and of the items are returned as the result, any
+    other exception is raised.
+    """
+    from items.api import MissingSummary
+
+    try:
+        args = shlex.split(line)
+    except ValueError as e:
+        return f"Error: {e}."
+    if args[0] not in BATCH_COMMANDS:
+        return f"Error: Unknown command {args[0]!r}."
+    command = group.commands[args[0]]
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        try:
+            with command.make_context(args[0], args[1:]) as ctx:
+                command.invoke(ctx)
+        except typer.TyperException as e:
+            print(f"Error: {e.format_message()}")
+        except typer.Exit as e:
+            # Raised by --help, after printing the help.
+            if e.exit_code:
+                print(f"Error: Exit code {e.exit_code}.")
+        except typer.Abort:
+            print("Error: Aborted.")
+        except MissingSummary:
+            print("Error: Missing summary.")
+    return out.getvalue().strip() or "ok"
+
+
+@app.command()
+def batch(
+    file: typer.FileText = typer.Argument("-", help="File of commands, - for stdin."),
+    chunk_size: int = typer.Option(500, "--chunk-size",
+                                   help="Commands per transaction."),
+):
+    """Run add, update, start, finish and delete commands, one per line.
+
+    Each chunk of lines is one transaction, and the result of each line is
+    printed once its chunk is committed. An unexpected error rolls back its
+    chunk, keeps the chunks before it and stops the batch with exit code 1.
+    """
+    group = typer.main.get_command(app)
+    lines = (
+        (n, line) for n, line in enumerate(file, 1)
+        if line.strip() and not line.lstrip().startswith("#")
+    )
+    with items_db() as db:
+        while chunk := list(islice(lines, chunk_size)):
+            results = []
+            try:
+                with db.transaction():
+                    for n, line in chunk:
+                        results.append((n, _run_batch_line(group, line)))
+            except Exception as e:
+                print(f"{n}: Error: {e!r}")
+                print(f"Error: Lines {chunk[0][0]} to {chunk[-1][0]} rolled back.")
+                raise typer.Exit(1)
+            for n, result in results:
+                print(f"{n}: {result}")
+
+
+@app.command("compile-templates")
+def compile_templates(
+    compiled_dir: Path = typer.Argument(
+        ..., help="Directory to write the compiled templates to."),
+):
+    """Precompile the HTML templates of the REST API.
+
+    Set ITEMS_TEMPLATES_COMPILED_DIR to the directory to have the REST API
+    load them from there.
+    """
+    from items.rest_api import precompile_templates
+
+    precompile_templates("templates", str(compiled_dir))
+
+
+@app.command()
+def daemon(stop: bool = typer.Option(False, "--stop", help="Stop the daemon.")):
+    """Keep the db open and run the commands of other `items` calls."""
+    from items import daemon as items_daemon
+
+    if stop:
+        if not items_daemon.stop():
+            print("Error: No daemon is running.")
+        return
+    items_daemon.serve()
+
+
+@app.command()
+def serve(
+    host: str = typer.Option("127.0.0.1", "--host"),
+    port: int = typer.Option(8000, "--port"),
+    workers: int = typer.Option(1, "-w", "--workers",
+                                help="Number of worker processes."),
+    profile: str = typer.Option("safe", "--profile",
+                                help="SQLite profile, see items.sqldb.PROFILES."),
+    busy_timeout: float = typer.Option(None, "--busy-timeout",
+                                       help="Seconds to wait for a lock."),
+    busy_retries: int = typer.Option(None, "--busy-retries",
+                                     help="Retries after waiting for a lock."),
+    busy_backoff: float = typer.Option(None, "--busy-backoff",
+                                       help="Seconds before the first retry."),
+    group_commit: int = typer.Option(None, "--group-commit",
+                                     help="Items added per transaction."),
+    group_commit_delay: float = typer.Option(
+        None, "--group-commit-delay",
+        help="Seconds to wait for more items to add."),
+):
+    """Serve the REST API with several worker processes on one db.
+
+    The default "safe" profile puts the db in WAL mode, in which readers
+    don't wait for writers, and syncs every commit to disk. "fast" syncs
+    less often, and may lose the latest commits on power loss. With --group-commit, items added by concurrent
+    requests are committed together.
+    """
+    import os
+
+    import uvicorn
+
+    # The workers read their settings from the environment.
+    os.environ["ITEMS_DB_DIR"] = str(get_path())
+    os.environ["ITEMS_DB_PROFILE"] = profile
+    for name, value in (("BUSY_TIMEOUT", busy_timeout),
+                        ("BUSY_RETRIES", busy_retries),
+                        ("BUSY_BACKOFF", busy_backoff),
+                        ("GROUP_COMMIT_SIZE", group_commit),
+                        ("GROUP_COMMIT_DELAY", group_commit_delay)):
+        if value is not None:
+            os.environ[f"ITEMS_DB_{name}"] = str(value)
+    # Create the schema once, so that the workers only need to read it.
+    items.ItemsDB(get_path(), profile=profile).close()
+    uvicorn.run("items.rest_api:app", host=host, port=port, workers=workers)
 
 
 @app.callback(invoke_without_command=True)
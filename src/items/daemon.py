@@ -0,0 +1,158 @@
+"""
+Background server that runs CLI commands against a warm ItemsDB.
+
+Starting Python, importing everything and opening the db takes far longer
+than most commands. `items daemon` keeps one process with an open db
+listening on a Unix domain socket in the db directory. The `items` entry
+point (main() below) forwards the command line to it when it is running,
+and runs the command in-process otherwise.
+
+This module is imported on every `items` call, so it must stay light.
+"""
+import contextlib
+import io
+import json
+import os
+import socket
+import sys
+import traceback
+
+from items.utils import get_path
+
+
+SOCKET_NAME = ".items_daemon.sock"
+STOP = "__stop__"
+
+
+def get_socket_path():
+    return get_path() / SOCKET_NAME
+
+
+def is_running(socket_path):
+    """Check whether a daemon is listening on socket_path."""
+    if not hasattr(socket, "AF_UNIX"):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        try:
+            conn.connect(os.fspath(socket_path))
+        except OSError:
+            return False
+    return True
+
+
+def forward(args, socket_path=None):
+    """Run a command in the daemon, print its output and return the exit code.
+
+    Returns None if no daemon is running.
+    """
+    socket_path = get_socket_path() if socket_path is None else socket_path
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        try:
+            conn.connect(os.fspath(socket_path))
+        except OSError:
+            return None
+        # From here on the daemon may have run the command, so it must not
+        # be run again in-process.
+        try:
+            request = {"args": list(args), "cwd": os.getcwd()}
+            conn.sendall(json.dumps(request).encode() + b"\n")
+            with conn.makefile("rb") as f:
+                response = json.loads(f.readline())
+        except (OSError, ValueError) as e:
+            print(f"Error: No answer from the daemon: {e}", file=sys.stderr)
+            return 1
+    sys.stdout.write(response["output"])
+    return response["exit_code"]
+
+
+def run_command(args):
+    """Run a CLI command in this process, return its output and exit code."""
+    import typer
+
+    from items.cli import app
+
+    command = typer.main.get_command(app)
+    out = io.StringIO()
+    exit_code = 0
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+        try:
+            command.main(args, prog_name="items")
+        except SystemExit as e:
+            exit_code = e.code or 0
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+    return out.getvalue(), exit_code
+
+
+def stop(socket_path=None):
+    """Ask the daemon to stop, return whether one was running."""
+    socket_path = get_socket_path() if socket_path is None else socket_path
+    return forward([STOP], socket_path) is not None
+
+
+def serve(socket_path=None):
+    """Answer forwarded commands until a stop request arrives."""
+    import socketserver
+    import threading
+
+    import rich.table  # noqa: F401
+
+    import items.cli  # noqa: F401
+    from items.utils import open_items_db
+
+    socket_path = get_socket_path() if socket_path is None else socket_path
+    open_items_db()  # warm up before accepting commands
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            line = self.rfile.readline()
+            if not line:
+                return  # is_running() only checks that we listen
+            request = json.loads(line)
+            if request["args"] == [STOP]:
+                output, exit_code = "", 0
+                threading.Thread(target=self.server.shutdown).start()
+            else:
+                cwd = os.getcwd()
+                try:
+                    os.chdir(request["cwd"])
+                    output, exit_code = run_command(request["args"])
+                except Exception:
+                    # Answer anyway, or the client would run it again.
+                    output, exit_code = traceback.format_exc(), 1
+                finally:
+                    os.chdir(cwd)
+            response = {"output": output, "exit_code": exit_code}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+    if is_running(socket_path):
+        print(f"Error: A daemon is already listening on {socket_path}.")
+        return
+    # A socket file left behind by a daemon that died would block bind().
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(socket_path)
+    server = socketserver.UnixStreamServer(os.fspath(socket_path), Handler)
+    os.chmod(socket_path, 0o600)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+
+
+def main():
+    """Entry point of the `items` command."""
+    args = sys.argv[1:]
+    # The daemon cannot read our stdin, which `items batch` reads by default,
+    # `items serve` runs until stopped, and `items compile-templates` reads
+    # the templates relative to our working directory.
+    if not (args and args[0] in ("daemon", "batch", "serve", "compile-templates")):
+        exit_code = forward(args)
+        if exit_code is not None:
+            sys.exit(exit_code)
+    from items.cli import app
+
+    app()
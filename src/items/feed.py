@@ -0,0 +1,76 @@
+"""
+Waiting for changes of the items, for long polls and server-sent events
+"""
+import asyncio
+import weakref
+
+from items.utils import async_items_db
+
+
+__all__ = [
+    "ChangeFeed",
+    "get_feed",
+]
+
+
+class ChangeFeed:
+    """Wake up clients waiting for the change log to grow.
+
+    While any client waits, one task reads the last change number every
+    interval seconds, whatever the number of clients. This also notices
+    writes by other processes. Without waiting clients, nothing runs.
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.seq = None
+        self._changed = asyncio.Condition()
+        self._waiters = 0
+        self._task = None
+
+    async def wait(self, since, timeout):
+        """Wait up to timeout seconds for a change after since.
+
+        Return the last change number, which is not after since on timeout.
+        """
+        async with self._changed:
+            self._waiters += 1
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._poll())
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait_for(
+                        lambda: self.seq is not None and self.seq > since
+                    ),
+                    timeout,
+                )
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._waiters -= 1
+            return self.seq
+
+    async def _poll(self):
+        while True:
+            async with async_items_db() as db:
+                seq = await db.last_change()
+            async with self._changed:
+                if seq != self.seq:
+                    self.seq = seq
+                    self._changed.notify_all()
+                if not self._waiters:
+                    self._task = None
+                    return
+            await asyncio.sleep(self.interval)
+
+
+# Conditions and tasks belong to an event loop, so there is a feed per loop.
+_feeds = weakref.WeakKeyDictionary()
+
+
+def get_feed():
+    """Return the ChangeFeed of the running event loop."""
+    loop = asyncio.get_running_loop()
+    if loop not in _feeds:
+        _feeds[loop] = ChangeFeed()
+    return _feeds[loop]
@@ -0,0 +1,97 @@
+"""
+Group commit of new items, for many concurrent inserts
+"""
+import asyncio
+
+
+__all__ = [
+    "GroupCommit",
+]
+
+
+class GroupCommit:
+    """Insert rows from concurrent callers in shared transactions.
+
+    Rows are queued and written with one call of create_many(), a
+    coroutine function inserting a list of rows in one transaction and
+    returning their ids. A group is written once it holds max_items rows,
+    or max_delay seconds after its first row, whichever comes first.
+    While a group is being written, the next one fills up.
+
+    add() returns the id of its row only after the group is committed, so
+    every caller still gets a durable acknowledgement, as far as the db
+    profile makes commits durable: "fast" may lose the latest ones on
+    power loss. If the transaction fails, the error is raised to every
+    caller of the group.
+    """
+
+    def __init__(self, create_many, max_items=100, max_delay=0.005):
+        self.create_many = create_many
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self._pending = []
+        self._full = None
+        self._flushing = False
+        self._task = None
+
+    async def add(self, row):
+        """Queue a row, wait for its group to be committed, return its id."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        if self._task is None:
+            # The event belongs to the running loop, so make one per task.
+            self._full = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        if len(self._pending) >= self.max_items:
+            self._full.set()
+        return await future
+
+    async def flush(self):
+        """Wait until all queued rows are written, without delay."""
+        if self._task is None:
+            return
+        self._flushing = True
+        self._full.set()
+        try:
+            await asyncio.shield(self._task)
+        finally:
+            self._flushing = False
+
+    async def _run(self):
+        try:
+            while self._pending:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+                group = self._pending[:self.max_items]
+                del self._pending[:self.max_items]
+                if len(self._pending) < self.max_items and not self._flushing:
+                    self._full.clear()
+                await self._write(group)
+        finally:
+            self._task = None
+            # Only left over if the task was cancelled.
+            for row, future in self._pending:
+                future.cancel()
+            self._pending.clear()
+
+    async def _write(self, group):
+        # Rows of callers that gave up waiting are not written.
+        group = [(row, future) for row, future in group if not future.done()]
+        if not group:
+            return
+        try:
+            ids = await self.create_many([row for row, future in group])
+        except asyncio.CancelledError:
+            for row, future in group:
+                future.cancel()
+            raise
+        except Exception as e:
+            for row, future in group:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (row, future), item_id in zip(group, ids):
+                if not future.done():
+                    future.set_result(item_id)
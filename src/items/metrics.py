@@ -0,0 +1,202 @@
+"""
+Query and call timings for the items project
+"""
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event
+
+
+__all__ = [
+    "Histogram",
+    "Metrics",
+    "METRICS",
+    "instrument_engine",
+    "instrument_methods",
+    "to_prometheus",
+]
+
+
+logger = logging.getLogger("items.sql")
+
+# Upper bounds of the histogram buckets in seconds.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+           2.5, 5.0, float("inf"))
+
+
+class Histogram:
+    """Number of observations per bucket, with their sum, count and maximum."""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+
+class Metrics:
+    """Statement and method timings of one process.
+
+    Failed statements, such as those timing out on a locked db, are kept
+    apart in failed_statements, by kind and error. Statements taking longer
+    than slow_query_seconds are logged as warnings on the "items.sql"
+    logger. It defaults to ITEMS_SLOW_QUERY_MS, and None turns the log off.
+    """
+
+    def __init__(self, slow_query_seconds=None):
+        if slow_query_seconds is None and os.getenv("ITEMS_SLOW_QUERY_MS"):
+            slow_query_seconds = float(os.getenv("ITEMS_SLOW_QUERY_MS")) / 1000
+        self.slow_query_seconds = slow_query_seconds
+        self.statements = {}
+        self.failed_statements = {}
+        self.methods = {}
+        self.slow_statements = 0
+        self._lock = threading.Lock()
+
+    def observe_statement(self, statement, seconds, error=None):
+        """Record a statement, error is the exception name if it failed."""
+        kind = statement.split(None, 1)[0].upper() if statement.strip() else "?"
+        with self._lock:
+            if error is None:
+                self.statements.setdefault(kind, Histogram()).observe(seconds)
+            else:
+                self.failed_statements.setdefault(
+                    (kind, error), Histogram()
+                ).observe(seconds)
+            slow = (self.slow_query_seconds is not None
+                    and seconds >= self.slow_query_seconds)
+            if slow:
+                self.slow_statements += 1
+        if slow and error is None:
+            logger.warning("Slow query (%.1f ms): %s", seconds * 1000, statement)
+        elif slow:
+            logger.warning("Slow query (%.1f ms, %s): %s", seconds * 1000, error,
+                           statement)
+
+    def observe_method(self, name, seconds):
+        with self._lock:
+            self.methods.setdefault(name, Histogram()).observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.statements.clear()
+            self.failed_statements.clear()
+            self.methods.clear()
+            self.slow_statements = 0
+
+
+METRICS = Metrics()
+
+
+def instrument_engine(engine, metrics=METRICS):
+    """Record the time of every statement executed by a (sync) engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("items_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["items_query_start"].pop()
+        metrics.observe_statement(statement, time.perf_counter() - start)
+
+    @event.listens_for(engine, "handle_error")
+    def failed(context):
+        # after_cursor_execute is skipped for failed statements.
+        conn = context.connection
+        starts = conn.info.get("items_query_start") if conn is not None else None
+        if not starts or context.statement is None:
+            return
+        seconds = time.perf_counter() - starts.pop()
+        metrics.observe_statement(context.statement, seconds,
+                                  type(context.original_exception).__name__)
+
+
+def _timed(func, name, metrics):
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                metrics.observe_method(name, time.perf_counter() - start)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.observe_method(name, time.perf_counter() - start)
+    return wrapper
+
+
+def instrument_methods(cls, metrics=METRICS):
+    """Class decorator that records the time of each public method call.
+
+    Methods that return iterators are timed until they return the iterator,
+    not until it is exhausted.
+    """
+    for name, func in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.isfunction(func):
+            setattr(cls, name, _timed(func, name, metrics))
+    return cls
+
+
+def _histogram_lines(metric, label, histograms):
+    """Return the lines of histograms keyed by the value of label.
+
+    With a tuple of labels, the keys are tuples of values.
+    """
+    lines = []
+    for value, histogram in sorted(histograms.items()):
+        if isinstance(label, tuple):
+            labels = ",".join(f'{name}="{v}"' for name, v in zip(label, value))
+        else:
+            labels = f'{label}="{value}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS, histogram.buckets):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{{labels}}} {histogram.sum!r}')
+        lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+    return lines
+
+
+def to_prometheus(metrics=METRICS):
+    """Return the metrics in the Prometheus text exposition format."""
+    with metrics._lock:
+        lines = [
+            "# HELP items_sql_statement_seconds Time spent executing SQL statements.",
+            "# TYPE items_sql_statement_seconds histogram",
+            *_histogram_lines("items_sql_statement_seconds", "statement",
+                              metrics.statements),
+            "# HELP items_sql_failed_statement_seconds Time spent executing SQL "
+            "statements that failed.",
+            "# TYPE items_sql_failed_statement_seconds histogram",
+            *_histogram_lines("items_sql_failed_statement_seconds",
+                              ("statement", "error"), metrics.failed_statements),
+            "# HELP items_sql_slow_statements_total SQL statements slower than "
+            "the slow query threshold.",
+            "# TYPE items_sql_slow_statements_total counter",
+            f"items_sql_slow_statements_total {metrics.slow_statements}",
+            "# HELP items_db_call_seconds Time spent in ItemsDB methods.",
+            "# TYPE items_db_call_seconds histogram",
+            *_histogram_lines("items_db_call_seconds", "method", metrics.methods),
+        ]
+    return "\n".join(lines) + "\n"
@@ -1,17 +1,84 @@
-from typing import Optional
+from typing import NamedTuple, Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
+class ItemRow(NamedTuple):
+    """A read-only item, much smaller and faster to create than an Item."""
+
+    id: int
+    summary: Optional[str]
+    owner: Optional[str]
+    state: str
+
+
+ITEM_FIELDS = ItemRow._fields
+
+
+class Changes(NamedTuple):
+    """The items changed after a sequence number of the change log."""
+
+    # The last change included; pass it as `since` to get the next changes.
+    seq: int
+    # True if the changes since `since` are no longer in the log, or `since`
+    # is newer than the log. Clients should then read all items again.
+    reset: bool
+    # ItemRow tuples of the items added or updated, in the order of changes.
+    items: list
+    # The ids of the deleted items.
+    deleted: list
+
+
 class Item(SQLModel, table=True):
+    __table_args__ = (Index("ix_item_owner_state", "owner", "state"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     summary: Optional[str] = None
-    owner: Optional[str] = None
-    state: str = "todo"
+    owner: Optional[str] = Field(default=None, index=True)
+    state: str = Field(default="todo", index=True)
 
     def __eq__(self, other):
         return (
             self.summary == other.summary and
             self.owner == other.owner and
             self.state == other.state
-        )
\ No newline at end of file
+        )
+
+
+class ItemsVersion(SQLModel, table=True):
+    """A single row that counts the writes to the item table."""
+
+    __tablename__ = "items_version"
+
+    id: int = Field(default=1, primary_key=True)
+    version: int = 0
+    modified: float = 0.0
+
+
+class ItemChange(SQLModel, table=True):
+    """One row per insert, update or delete of an item.
+
+    Rows are added by triggers, see items.sqldb.CHANGES_SCHEMA.
+    """
+
+    __tablename__ = "item_change"
+    # Never reuse the sequence numbers of pruned rows.
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq: Optional[int] = Field(default=None, primary_key=True)
+    item_id: int
+
+
+class ItemSummary(SQLModel, table=True):
+    """The number of items per owner and state.
+
+    Kept up to date by triggers, see items.sqldb.SUMMARY_SCHEMA. Items
+    without an owner are counted for the owner "".
+    """
+
+    __tablename__ = "item_summary"
+
+    owner: str = Field(primary_key=True)
+    state: str = Field(primary_key=True)
+    count: int = 0
@@ -0,0 +1,166 @@
+"""
+Per-request profiling for the REST API of the items project
+"""
+import asyncio
+import cProfile
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+
+from items.utils import get_profiling_dir, get_profiling_hosts
+
+
+__all__ = [
+    "ProfilingMiddleware",
+    "PROFILE_HEADER",
+    "PROFILE_PARAM",
+    "may_profile",
+    "phase",
+    "profile_path",
+]
+
+
+# Clients ask for a profile with `X-Items-Profile: 1` or `?_profile=1`.
+PROFILE_HEADER = "X-Items-Profile"
+PROFILE_PARAM = "_profile"
+
+# Seconds spent in each phase of the request being profiled, or None.
+_phases: ContextVar[dict | None] = ContextVar("items_phases", default=None)
+
+# cProfile profiles the whole thread, so only one request at a time.
+_lock = asyncio.Lock()
+
+# Responses that may never end, and so cannot be held back.
+STREAMING_TYPES = ("text/event-stream",)
+
+
+@contextmanager
+def phase(name):
+    """Add the time spent in the with block to a phase of the request.
+
+    This does nothing unless the request is being profiled.
+    """
+    phases = _phases.get()
+    if phases is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def may_profile(request):
+    """Check whether the client of a request is allowed to profile."""
+    return (request.client is not None
+            and request.client.host in get_profiling_hosts())
+
+
+def wants_profile(request):
+    """Check whether a request asks for a profile and may get one."""
+    asked = (request.headers.get(PROFILE_HEADER, "") == "1"
+             or request.query_params.get(PROFILE_PARAM, "") == "1")
+    return asked and may_profile(request)
+
+
+def profile_path(profile_id):
+    """Return the path of a stored profile, or None for an invalid id."""
+    if not re.fullmatch(r"[0-9a-f]{32}", profile_id):
+        return None
+    return get_profiling_dir() / f"{profile_id}.prof"
+
+
+def is_streaming(start_message):
+    """Check whether a response start message is for an endless stream."""
+    headers = MutableHeaders(raw=list(start_message["headers"]))
+    content_type = headers.get("content-type", "").split(";")[0].strip()
+    return content_type in STREAMING_TYPES
+
+
+def server_timing(phases):
+    """Return a Server-Timing header value, with the phases in ms."""
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}"
+                     for name, seconds in phases.items())
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles the requests asking for it.
+
+    The cProfile stats are stored in the profiling directory, to be read
+    with pstats or fetched from /profiles/<id>. The response carries the
+    id in the X-Items-Profile header and the phase times as Server-Timing.
+    Other requests are passed through untouched.
+
+    Only one request is profiled at a time, but cProfile records the whole
+    thread: unprofiled requests handled by the event loop meanwhile show up
+    in the profile too. Profile on an otherwise idle server for clean data.
+    Event streams never end, so they are sent unprofiled, without headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not wants_profile(Request(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        # Hold back the response until the profile is done, so that its
+        # headers can be added. Streamed bodies are collected as well.
+        start_message = None
+        body = []
+        passing = False
+        profiler = cProfile.Profile()
+
+        async def send_later(message):
+            nonlocal start_message, passing
+            if passing:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                if is_streaming(message):
+                    # Give up profiling, and let other requests be profiled.
+                    passing = True
+                    profiler.disable()
+                    _lock.release()
+                    await send(message)
+                else:
+                    start_message = message
+            elif message["type"] == "http.response.body":
+                body.append(message.get("body", b""))
+
+        await _lock.acquire()
+        try:
+            phases = {}
+            token = _phases.set(phases)
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send_later)
+            finally:
+                profiler.disable()
+                _phases.reset(token)
+            phases["total"] = time.perf_counter() - start
+        finally:
+            if not passing:
+                _lock.release()
+        if passing:
+            return
+
+        profile_id = uuid.uuid4().hex
+        path = profile_path(profile_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(path)
+
+        body = b"".join(body)
+        headers = MutableHeaders(raw=list(start_message["headers"]))
+        headers["content-length"] = str(len(body))
+        headers[PROFILE_HEADER] = profile_id
+        headers["server-timing"] = server_timing(phases)
+        await send({**start_message, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
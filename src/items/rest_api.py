@@ -1,14 +1,42 @@
 
-from typing import Any, Callable
-
-from fastapi import FastAPI, Request, Response
-from fastapi.responses import HTMLResponse, JSONResponse
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, AsyncIterable, Callable
+
+import pydantic_core
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
-from jinja2 import Environment, FileSystemLoader, Template, TemplateNotFound
-
+from jinja2 import (
+    ChoiceLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    ModuleLoader,
+    Template,
+    TemplateNotFound,
+)
+from sqlmodel import SQLModel
+
+from items.api import Changes, InvalidItemId, MissingSummary
+from items.feed import get_feed
+from items.metrics import to_prometheus
 from items.model import Item
-from items.utils import items_db
+from items.profiling import ProfilingMiddleware, may_profile, phase, profile_path
+from items.utils import (
+    async_items_db,
+    close_async_items_dbs,
+    get_templates_compiled_dir,
+    open_async_items_db,
+)
 
 app = FastAPI()
 
@@ -16,19 +44,51 @@ app = FastAPI()
 # By default, FastAPI's JSONResponse will render the response and then forget
 # the original data that has been passed in. We subclass the default behavior to
 # keep the original Python object, so that we can later pass it into Jinja.
+# Converting to JSON is done by `dumps`, which uses orjson if it is installed
+# and pydantic-core's serializer otherwise. Both are much faster than the json
+# module for large lists, and both handle SQLModel objects.
+
+
+def _orjson_default(obj: Any) -> Any:
+    if isinstance(obj, SQLModel):
+        return obj.model_dump()
+    raise TypeError
+
+
+def get_json_dumps() -> Callable[[Any], bytes]:
+    """Return the fastest available function that converts data to JSON."""
+    try:
+        import orjson
+    except ImportError:
+        return pydantic_core.to_json
+    return lambda content: orjson.dumps(content, default=_orjson_default)
 
 
 class PreserveJSONResponse(JSONResponse):
     """A JSONResponse that remembers the original Python object."""
 
+    dumps = staticmethod(get_json_dumps())
+
     def render(self, content: Any) -> bytes:
         # Store the Python object in self.original_data.
         self.original_data = content
-        # Use the parent class to convert to JSON.
-        return super().render(content)
+        # Convert to JSON.
+        with phase("serialize"):
+            return self.dumps(content)
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the db once at startup and close it at shutdown."""
+    await open_async_items_db()
+    yield
+    await close_async_items_dbs()
 
-app = FastAPI(default_response_class=PreserveJSONResponse)
+
+app = FastAPI(default_response_class=PreserveJSONResponse, lifespan=lifespan)
+
+# Profile single requests on demand, see items.profiling.
+app.add_middleware(ProfilingMiddleware)
 
 
 # We define a custom route handler to hook into FastAPI's request/response
@@ -37,7 +97,92 @@ app = FastAPI(default_response_class=PreserveJSONResponse)
 # Apparently a simple middleware sadly doesn't have access to that information.
 
 
-def get_template_render_route_class(template_dir: str) -> type:
+# Path operations can skip building the whole JSON response when RenderRoute
+# is going to render HTML anyway. They check `request.state.render_html` and
+# return a DataStream, whose data is handed to the template while it is being
+# read from the db.
+
+
+class DataStream(Response):
+    """A response that carries an async iterable for the template to render."""
+
+    def __init__(self, data: AsyncIterable, headers: dict | None = None):
+        super().__init__(headers=headers)
+        self.data = data
+
+
+async def buffered(chunks: AsyncIterable[str], size: int = 256):
+    """Join small chunks of rendered text before sending them."""
+    buffer = []
+    async for chunk in chunks:
+        buffer.append(chunk)
+        if len(buffer) >= size:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+async def rendering(chunks: AsyncIterable[str]):
+    """Buffer streamed template output, timing it as the render phase.
+
+    The render phase includes reading the rows the template iterates over.
+    """
+    chunks = buffered(chunks).__aiter__()
+    while True:
+        with phase("render"):
+            try:
+                chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                return
+        yield chunk
+
+
+def copy_headers(response: Response) -> dict:
+    """Return the headers of a response that don't depend on its body."""
+    return {
+        k: v
+        for k, v in response.headers.items()
+        if k not in ("content-length", "content-type")
+    }
+
+
+# All routes share one Jinja environment per template directory. Compiled
+# templates are cached in memory by the environment and on disk by the
+# bytecode cache, so that new processes don't have to parse them again.
+
+
+@lru_cache
+def get_jinja_env(template_dir: str, compiled_dir: str | None = None) -> Environment:
+    """Return the shared Jinja environment for template_dir.
+
+    If compiled_dir holds templates precompiled with precompile_templates(),
+    they are loaded from there instead of being parsed.
+    """
+    loader = FileSystemLoader(template_dir)
+    if compiled_dir is not None:
+        loader = ChoiceLoader([ModuleLoader(compiled_dir), loader])
+    return Environment(
+        loader=loader,
+        # The cache doesn't tell sync from async bytecode, so use our own name.
+        bytecode_cache=FileSystemBytecodeCache(
+            pattern="__items_jinja2_async_%s.cache"
+        ),
+        # Templates are looked up once per route, so don't watch the files.
+        auto_reload=False,
+        # Allows rendering data from async iterators, see DataStream.
+        enable_async=True,
+    )
+
+
+def precompile_templates(template_dir: str, compiled_dir: str) -> None:
+    """Compile all templates in template_dir to Python modules in compiled_dir."""
+    get_jinja_env(template_dir).compile_templates(compiled_dir, zip=None)
+
+
+def get_template_render_route_class(
+    template_dir: str, compiled_dir: str | None = None
+) -> type:
     """Return APIRoute subclass that renders HTML templates from JSON.
 
     This is a function that returns a class, mainly because we'd like to be able
@@ -52,10 +197,8 @@ def get_template_render_route_class(template_dir: str) -> type:
             # Get the handler from the parent class.
             original = super().get_route_handler()
 
-            # Set up Jinja to be able to render templates.
-            jinja_env = Environment(
-                loader=FileSystemLoader(template_dir),
-            )
+            # Get the Jinja environment to be able to render templates.
+            jinja_env = get_jinja_env(template_dir, compiled_dir)
 
             def is_hx(request: Request) -> bool:
                 """Check whether the request is sent by HTMX."""
@@ -87,10 +230,28 @@ def get_template_render_route_class(template_dir: str) -> type:
                 except TemplateNotFound:
                     return None
 
+            # Look up the template once, when the route is set up. If there
+            # is none, we remember that as well and never look again.
+            template = get_template(self.dependant.call)
+
             # This is the actual function that is called on every request.
             async def route_handler(request: Request) -> Response:
+                # Tell the path operation whether we will render HTML.
+                request.state.render_html = (
+                    should_render(request) and template is not None
+                )
+
                 # Handle the request and get back a response.
-                response = await original(request)
+                with phase("endpoint"):
+                    response = await original(request)
+
+                if request.state.render_html and isinstance(response, DataStream):
+                    # Render the template while the data is being read.
+                    return StreamingResponse(
+                        rendering(template.generate_async(data=response.data)),
+                        media_type="text/html",
+                        headers=copy_headers(response),
+                    )
 
                 if (
                     # rendering as HTML makes sense
@@ -98,14 +259,15 @@ def get_template_render_route_class(template_dir: str) -> type:
                     # the response is actually JSON that we can work with
                     and isinstance(response, PreserveJSONResponse)
                     # we have a template available
-                    and (template := get_template(self.dependant.call))
+                    and template is not None
                 ):
-                    # Render the Jinja template and return as HTML response.
-                    return HTMLResponse(
-                        template.render(
+                    # Render the Jinja template and return as HTML response,
+                    # keeping headers like ETag set by the path operation.
+                    with phase("render"):
+                        html = await template.render_async(
                             data=response.original_data,
                         )
-                    )
+                    return HTMLResponse(html, headers=copy_headers(response))
 
                 # If anything failed or the requirements were not met, return
                 # the original response.
@@ -117,22 +279,292 @@ def get_template_render_route_class(template_dir: str) -> type:
     return RenderRoute
 
 
-app.router.route_class = get_template_render_route_class("templates")
+app.router.route_class = get_template_render_route_class(
+    "templates", get_templates_compiled_dir()
+)
 
 
 
+async def _ndjson_items(after: int | None, limit: int | None):
+    """Yield items as newline-delimited JSON, one line per item."""
+    async with async_items_db() as db:
+        async for row in db.iter_items(after=after, limit=limit, read_only=True):
+            yield PreserveJSONResponse.dumps(row._asdict()) + b"\n"
+
+
+def cache_headers(version: int, modified: float, representation: str) -> dict:
+    """Return the validator headers for a given data version.
+
+    The ETag names the representation as well, so that a cache sending the
+    ETag of the JSON response never gets a 304 for the HTML one.
+    """
+    return {
+        "ETag": f'W/"{version}-{representation}"',
+        "Last-Modified": formatdate(modified, usegmt=True),
+        "Vary": "Accept, HX-Request",
+    }
+
+
+def not_modified(request: Request, headers: dict) -> bool:
+    """Check whether the client already has the current data."""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        etags = [etag.strip() for etag in if_none_match.split(",")]
+        return "*" in etags or headers["ETag"] in etags
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return since >= parsedate_to_datetime(headers["Last-Modified"])
+    return False
+
+
 @app.get("/items")
-def get_all_items() -> list[Item]:
-    """Return a list of all items."""
-    with items_db() as db:
-        return db.list_items()
+async def get_all_items(
+    request: Request,
+    limit: int | None = None,
+    after: int | None = None,
+) -> list[Item]:
+    """Return a list of all items.
+
+    Use `limit` and `after` (the id of the last item seen) to page through
+    the items. Clients sending `Accept: application/x-ndjson` get the items
+    streamed as newline-delimited JSON. Responses carry an ETag, and
+    conditional requests get a 304 while the items are unchanged.
+    """
+    if request.headers.get("Accept", "") == "application/x-ndjson":
+        representation = "ndjson"
+    elif request.state.render_html:
+        representation = "html"
+    else:
+        representation = "json"
+    async with async_items_db() as db:
+        with phase("db"):
+            headers = cache_headers(*await db.data_version(), representation)
+        if not_modified(request, headers):
+            return Response(status_code=304, headers=headers)
+        if representation == "ndjson":
+            return StreamingResponse(
+                _ndjson_items(after, limit),
+                media_type="application/x-ndjson",
+                headers=headers,
+            )
+        if representation == "html":
+            return DataStream(
+                db.iter_items(after=after, limit=limit, read_only=True),
+                headers=headers,
+            )
+        with phase("db"):
+            rows = await db.list_rows(after=after, limit=limit)
+    # The rows come straight from the db, so there is no need to let FastAPI
+    # validate them against list[Item] by returning them as they are.
+    return PreserveJSONResponse(
+        [row._asdict() for row in rows], headers=headers
+    )
+
+
+@app.get("/items/search")
+async def search_items(
+    q: str,
+    owner: str | None = None,
+    state: str | None = None,
+    limit: int = 20,
+) -> list[Item]:
+    """Return the items whose summary matches `q`, best matches first."""
+    async with async_items_db() as db:
+        with phase("db"):
+            rows = await db.search(q, owner=owner, state=state, limit=limit)
+    return PreserveJSONResponse([row._asdict() for row in rows])
+
+
+@app.get("/items/summary")
+async def items_summary(owner: str | None = None) -> dict[str, dict[str, int]]:
+    """Return the number of items per owner and state."""
+    async with async_items_db() as db:
+        with phase("db"):
+            summary = await db.summary(owner=owner)
+    return PreserveJSONResponse(summary)
+
+
+# Clients keep up with the items by asking for the changes after the last
+# change number they have seen. Long polls and event streams wait for the
+# next change with the ChangeFeed of items.feed.
+
+CHANGES_LIMIT = 1000
+MAX_WAIT = 60.0
+KEEPALIVE = 15.0
+
+
+def _changes_dict(changes: Changes) -> dict:
+    return {
+        "seq": changes.seq,
+        "reset": changes.reset,
+        "items": [row._asdict() for row in changes.items],
+        "deleted": changes.deleted,
+    }
+
+
+@app.get("/items/changes")
+async def item_changes(
+    since: int = 0,
+    limit: int = CHANGES_LIMIT,
+    wait: float = 0,
+) -> dict:
+    """Return the items changed after the change number `since`.
+
+    The response has the number of the last change included (`seq`), the
+    added or updated `items` and the ids of the `deleted` ones. If `reset`
+    is true, the changes are no longer known and all items should be read
+    again. With `wait`, the request waits up to that many seconds for a
+    change if there is none yet (long polling).
+    """
+    async with async_items_db() as db:
+        with phase("db"):
+            changes = await db.changes(since, limit)
+        if wait > 0 and not (changes.reset or changes.items or changes.deleted):
+            await get_feed().wait(since, min(wait, MAX_WAIT))
+            with phase("db"):
+                changes = await db.changes(since, limit)
+    return PreserveJSONResponse(_changes_dict(changes))
+
+
+async def _change_events(since: int | None):
+    """Yield server-sent events with the changes after since, forever."""
+    async with async_items_db() as db:
+        if since is None:
+            since = await db.last_change()
+        while True:
+            changes = await db.changes(since, CHANGES_LIMIT)
+            if changes.reset or changes.items or changes.deleted:
+                since = changes.seq
+                data = PreserveJSONResponse.dumps(_changes_dict(changes)).decode()
+                yield f"id: {since}\nevent: changes\ndata: {data}\n\n"
+                continue
+            seq = await get_feed().wait(since, KEEPALIVE)
+            if seq is None or seq <= since:
+                # A comment keeps proxies from closing the idle connection.
+                yield ": keepalive\n\n"
+
+
+@app.get("/items/changes/stream")
+async def stream_item_changes(request: Request, since: int | None = None):
+    """Send the changes as server-sent events of type `changes`.
+
+    Without `since`, only changes from now on are sent. A reconnecting
+    EventSource continues after its Last-Event-ID.
+    """
+    last_event_id = request.headers.get("Last-Event-ID")
+    if last_event_id is not None and last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(
+        _change_events(since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
 
 @app.post("/add_item")
-def add_item(item: Item):
-    with items_db() as db:
-        db.add_item(item)
+async def add_item(item: Item):
+    async with async_items_db() as db:
+        with phase("db"):
+            await db.add_item(item)
     return Response(headers={"HX-Refresh": "true"})
 
 
+class ItemMods(SQLModel):
+    """The fields of an item to change; unset fields are left as they are."""
+
+    summary: str | None = None
+    owner: str | None = None
+    state: str | None = None
+
+
+class BulkUpdate(SQLModel):
+    ids: list[int]
+    mods: ItemMods
+
+
+class BulkDelete(SQLModel):
+    ids: list[int]
+
+
+class BulkTransition(SQLModel):
+    state: str
+    from_state: str | None = None
+    owner: str | None = None
+    ids: list[int] | None = None
+
+
+@app.post("/items/bulk")
+async def add_items(items: list[Item]) -> list[int]:
+    """Add several items in one transaction, return their ids."""
+    async with async_items_db() as db:
+        try:
+            return await db.add_items(items)
+        except MissingSummary:
+            raise HTTPException(status_code=422, detail="Missing summary")
+
+
+@app.post("/items/bulk/update")
+async def update_items(bulk: BulkUpdate) -> list[int]:
+    """Apply the same modifications to several items, return their ids."""
+    async with async_items_db() as db:
+        try:
+            # Item(**mods) would fill in the default state of new items.
+            mods = Item(summary=bulk.mods.summary, owner=bulk.mods.owner,
+                        state=bulk.mods.state)
+            await db.update_items(bulk.ids, mods)
+        except InvalidItemId as e:
+            raise HTTPException(status_code=404, detail=f"Invalid item ids {e}")
+    return bulk.ids
+
+
+@app.post("/items/bulk/delete")
+async def delete_items(bulk: BulkDelete) -> list[int]:
+    """Remove several items, return their ids."""
+    async with async_items_db() as db:
+        try:
+            await db.delete_items(bulk.ids)
+        except InvalidItemId as e:
+            raise HTTPException(status_code=404, detail=f"Invalid item ids {e}")
+    return bulk.ids
+
+
+@app.post("/items/bulk/transition")
+async def transition_items(bulk: BulkTransition) -> list[int]:
+    """Set the state of the matching items in from_state, return their ids.
+
+    At least one of from_state, owner and ids must be given, so that a
+    request cannot change all items by mistake.
+    """
+    if bulk.from_state is None and bulk.owner is None and bulk.ids is None:
+        raise HTTPException(
+            status_code=422, detail="Give at least one of from_state, owner and ids"
+        )
+    async with async_items_db() as db:
+        return await db.transition_items(bulk.state, from_state=bulk.from_state,
+                                         owner=bulk.owner, item_ids=bulk.ids)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Return the SQL statement and ItemsDB call timings for Prometheus."""
+    return PlainTextResponse(
+        to_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/profiles/{profile_id}")
+async def get_profile(request: Request, profile_id: str):
+    """Download the cProfile stats of a profiled request."""
+    path = profile_path(profile_id)
+    if not may_profile(request) or path is None or not path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream",
+                        filename=path.name)
+
+
 # Also let FastAPI serve the HTMX "frontend" of our application.
 app.mount("/", StaticFiles(directory="static", html=True), name="static")
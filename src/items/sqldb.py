@@ -1,56 +1,556 @@
 """
 DB for the items project
 """
-from sqlmodel import Session, create_engine, select, update, delete
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from itertools import count, islice
 
-from .model import Item
+from sqlalchemy import column, event, literal_column, table, text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, create_engine, func, insert, select, update, delete
+
+from .metrics import instrument_engine
+from .model import (
+    ITEM_FIELDS,
+    Item,
+    ItemChange,
+    ItemRow,
+    ItemSummary,
+    ItemsVersion,
+)
+
+
+# Keep the number of bound parameters per statement well below SQLite's limit.
+CHUNK_SIZE = 500
+
+
+# PRAGMA settings applied to every new SQLite connection.
+PROFILES = {
+    # SQLite's own defaults: rollback journal, full sync.
+    "default": {},
+    # WAL lets readers run concurrently with a writer; fsync only at
+    # checkpoints, so a power loss may lose the latest commits but never
+    # corrupts the db.
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # WAL with an fsync on every commit.
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+}
+
+
+# Full-text index over the summaries, kept in sync with the item table by
+# triggers. It stores no copy of the text (content='item'), and the prefix
+# option adds indexes for 2- and 3-character prefixes, which makes prefix
+# queries fast.
+FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS item_fts USING fts5("
+    "summary, content='item', content_rowid='id', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS item_fts_insert AFTER INSERT ON item BEGIN "
+    "INSERT INTO item_fts(rowid, summary) VALUES (new.id, new.summary); END",
+    "CREATE TRIGGER IF NOT EXISTS item_fts_delete AFTER DELETE ON item BEGIN "
+    "INSERT INTO item_fts(item_fts, rowid, summary) "
+    "VALUES ('delete', old.id, old.summary); END",
+    "CREATE TRIGGER IF NOT EXISTS item_fts_update AFTER UPDATE OF summary ON item "
+    "BEGIN "
+    "INSERT INTO item_fts(item_fts, rowid, summary) "
+    "VALUES ('delete', old.id, old.summary); "
+    "INSERT INTO item_fts(rowid, summary) VALUES (new.id, new.summary); END",
+)
+
+# The change log is kept by triggers too, so that every write is logged,
+# including bulk ones. Only the last CHANGE_LOG_SIZE changes are kept; every
+# thousandth change prunes the older ones.
+CHANGE_LOG_SIZE = 100_000
+CHANGES_SCHEMA = (
+    "CREATE TRIGGER IF NOT EXISTS item_change_insert AFTER INSERT ON item BEGIN "
+    "INSERT INTO item_change(item_id) VALUES (new.id); END",
+    "CREATE TRIGGER IF NOT EXISTS item_change_update AFTER UPDATE ON item BEGIN "
+    "INSERT INTO item_change(item_id) VALUES (new.id); END",
+    "CREATE TRIGGER IF NOT EXISTS item_change_delete AFTER DELETE ON item BEGIN "
+    "INSERT INTO item_change(item_id) VALUES (old.id); END",
+    "CREATE TRIGGER IF NOT EXISTS item_change_prune AFTER INSERT ON item_change "
+    "WHEN new.seq % 1000 = 0 BEGIN "
+    f"DELETE FROM item_change WHERE seq <= new.seq - {CHANGE_LOG_SIZE}; END",
+)
+
+# The counts per owner and state, kept by triggers as well, so that counting
+# takes time proportional to the number of owners and states, not items.
+_SUMMARY_ADD = (
+    "INSERT INTO item_summary(owner, state, count) "
+    "VALUES (coalesce(new.owner, ''), new.state, 1) "
+    "ON CONFLICT(owner, state) DO UPDATE SET count = count + 1;"
+)
+_SUMMARY_REMOVE = (
+    "UPDATE item_summary SET count = count - 1 "
+    "WHERE owner = coalesce(old.owner, '') AND state = old.state; "
+    "DELETE FROM item_summary "
+    "WHERE owner = coalesce(old.owner, '') AND state = old.state AND count = 0;"
+)
+SUMMARY_SCHEMA = (
+    "CREATE TRIGGER IF NOT EXISTS item_summary_insert AFTER INSERT ON item BEGIN "
+    f"{_SUMMARY_ADD} END",
+    "CREATE TRIGGER IF NOT EXISTS item_summary_delete AFTER DELETE ON item BEGIN "
+    f"{_SUMMARY_REMOVE} END",
+    "CREATE TRIGGER IF NOT EXISTS item_summary_update AFTER UPDATE OF owner, state "
+    "ON item WHEN old.owner IS NOT new.owner OR old.state IS NOT new.state BEGIN "
+    f"{_SUMMARY_REMOVE} {_SUMMARY_ADD} END",
+)
+
+item_fts = table("item_fts", column("rowid"), column("rank"))
+
+# Ranking all matches of a word found in most items would take a long time,
+# so only the newest matches are ranked.
+SEARCH_CANDIDATES = 5000
+
+
+def _unique(ids):
+    """Return ids without duplicates, which could be found in several chunks."""
+    return list(dict.fromkeys(ids))
+
+
+def _chunks(iterable, size=CHUNK_SIZE):
+    """Yield lists of up to size elements from iterable."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _select(read_only=False):
+    """Select whole items, or only the columns needed for an ItemRow."""
+    if read_only:
+        return select(*[getattr(Item, field) for field in ITEM_FIELDS])
+    return select(Item)
+
+
+def _filter(statement, owner=None, state=None, model=Item):
+    """Add WHERE clauses for the given owner and state to a statement."""
+    if owner is not None:
+        statement = statement.where(model.owner == owner)
+    if state is not None:
+        statement = statement.where(model.state == state)
+    return statement
+
+
+def _transition(state, from_state=None, owner=None):
+    """Return an UPDATE of the state that returns the ids it changed."""
+    statement = _filter(update(Item), owner, None).values(state=state)
+    if from_state is not None:
+        if isinstance(from_state, str):
+            from_state = [from_state]
+        statement = statement.where(Item.state.in_(from_state))
+    return statement.returning(Item.id)
+
+
+def fts_query(query):
+    """Turn free text into an FTS5 query matching all words as prefixes.
+
+    Return None if the text contains no words.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _search(match, owner=None, state=None, limit=None):
+    """Return a statement selecting ItemRow columns of matches, best first.
+
+    The best matches among the newest SEARCH_CANDIDATES ones are returned.
+    """
+    candidates = (
+        select(*[getattr(Item, field) for field in ITEM_FIELDS],
+               item_fts.c.rank.label("rank"))
+        .join(item_fts, item_fts.c.rowid == Item.id)
+        .where(literal_column("item_fts").op("MATCH")(match))
+    )
+    candidates = (
+        _filter(candidates, owner, state)
+        .order_by(item_fts.c.rowid.desc())
+        .limit(SEARCH_CANDIDATES)
+        .subquery()
+    )
+    return (
+        select(*[candidates.c[field] for field in ITEM_FIELDS])
+        .order_by(candidates.c.rank, candidates.c.id)
+        .limit(limit)
+    )
+
+
+def _changes(since, limit=None):
+    """Return a statement selecting the items changed after since.
+
+    Each changed item is selected once, with its last change and its
+    current columns, which are NULL for deleted items.
+    """
+    last = func.max(ItemChange.seq)
+    latest = (
+        select(ItemChange.item_id, last.label("seq"))
+        .where(ItemChange.seq > since)
+        .group_by(ItemChange.item_id)
+        .order_by(last)
+        .limit(limit)
+        .subquery()
+    )
+    return (
+        select(latest.c.seq, latest.c.item_id,
+               *[getattr(Item, field) for field in ITEM_FIELDS])
+        .outerjoin(Item, Item.id == latest.c.item_id)
+        .order_by(latest.c.seq)
+    )
+
+
+def _change_range():
+    """Return a statement selecting the first and last seq in the log."""
+    return select(func.min(ItemChange.seq), func.max(ItemChange.seq))
+
+
+def listen_pragmas(engine, profile, busy_timeout=None):
+    """Apply the PRAGMAs of a profile on every new connection of engine.
+
+    busy_timeout overrides the time in seconds to wait for a lock.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile {profile!r}")
+    pragmas = dict(PROFILES[profile])
+    if busy_timeout is not None:
+        pragmas["busy_timeout"] = int(busy_timeout * 1000)
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    event.listen(engine, "connect", set_pragmas)
+
+
+def _count(owner=None, state=None):
+    """Return a statement counting items from the summary table."""
+    statement = select(func.coalesce(func.sum(ItemSummary.count), 0))
+    return _filter(statement, owner, state, model=ItemSummary)
+
+
+def _count_by_state(owner=None):
+    statement = select(ItemSummary.state, func.sum(ItemSummary.count))
+    statement = _filter(statement, owner, None, model=ItemSummary)
+    return statement.group_by(ItemSummary.state).order_by(ItemSummary.state)
+
+
+def _summary(owner=None):
+    statement = select(ItemSummary.owner, ItemSummary.state, ItemSummary.count)
+    statement = _filter(statement, owner, None, model=ItemSummary)
+    return statement.order_by(ItemSummary.owner, ItemSummary.state)
+
+
+def _existing_tables(connection):
+    return set(connection.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'table'")
+    ).scalars())
+
+
+# Stored as PRAGMA user_version by create_schema(). Increase it whenever
+# create_schema() changes, so that existing databases are brought up to date.
+SCHEMA_VERSION = 1
+
+
+def create_schema(connection):
+    """Create the tables and any missing indexes.
+
+    This only reads the schema version if the db is up to date, so that
+    processes opening it at the same time don't compete for a write lock.
+    """
+    if connection.exec_driver_sql("PRAGMA user_version").scalar() == SCHEMA_VERSION:
+        return
+    tables = _existing_tables(connection)
+    Item.metadata.create_all(connection)
+    # create_all() skips tables that already exist, so databases
+    # created before the indexes were declared need them added here.
+    for index in Item.__table__.indexes:
+        index.create(connection, checkfirst=True)
+    for ddl in FTS_SCHEMA + CHANGES_SCHEMA + SUMMARY_SCHEMA:
+        connection.execute(text(ddl))
+    # Fill in the new tables of databases created before they existed.
+    if "item_fts" not in tables:
+        connection.execute(text("INSERT INTO item_fts(item_fts) VALUES ('rebuild')"))
+    if "item_summary" not in tables:
+        connection.execute(text(
+            "INSERT INTO item_summary(owner, state, count) "
+            "SELECT coalesce(owner, ''), state, count(*) FROM item GROUP BY 1, 2"
+        ))
+    connection.execute(
+        insert(ItemsVersion).prefix_with("OR IGNORE").values(modified=time.time())
+    )
+    connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def is_busy(error):
+    """Check whether an error means that another connection holds a lock."""
+    return isinstance(error, OperationalError) and (
+        "locked" in str(error.orig) or "busy" in str(error.orig)
+    )
+
+
+def backoff(attempt, base, limit=2.0):
+    """Return the seconds to wait before a retry, with exponential backoff."""
+    return min(base * 2 ** attempt, limit) * random.uniform(0.5, 1.5)
+
+
+def _bump_version():
+    """Return a statement that marks the items as changed."""
+    return update(ItemsVersion).values(
+        version=ItemsVersion.version + 1, modified=time.time()
+    )
 
 
 class SQLDB:
-    def __init__(self, db_file_prefix: str):
-        self._db = create_engine(f"sqlite:///{db_file_prefix}.db")
-        Item.metadata.create_all(self._db)
+    """Items in an SQLite db.
 
-    def create(self, item: Item) -> int:
+    Writes start with BEGIN IMMEDIATE, so they take the write lock before
+    reading anything and never have to be rolled back for a concurrent
+    writer. If another process holds the lock for longer than busy_timeout
+    seconds, the write is retried busy_retries times, waiting busy_backoff
+    seconds, doubled at each retry up to 2 seconds.
+    """
+
+    def __init__(self, db_file_prefix: str, pool_size=5, max_overflow=10,
+                 profile="default", busy_timeout=None, busy_retries=5,
+                 busy_backoff=0.05):
+        self._db = create_engine(
+            f"sqlite:///{db_file_prefix}.db",
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+        )
+        self.busy_retries = busy_retries
+        self.busy_backoff = busy_backoff
+        listen_pragmas(self._db, profile, busy_timeout)
+        instrument_engine(self._db)
+        with self._db.begin() as connection:
+            create_schema(connection)
+        # The session of the transaction() a thread is in, if any.
+        self._local = threading.local()
+
+    @contextmanager
+    def transaction(self):
+        """Run all calls inside the with block in a single transaction."""
+        if getattr(self._local, "session", None) is not None:
+            yield  # already in a transaction
+            return
         with Session(self._db) as session:
-            session.add(item)
+            self._begin_immediate(session)
+            self._local.session = session
+            try:
+                yield
+                session.commit()
+            finally:
+                self._local.session = None
+
+    @contextmanager
+    def _session(self, write=False):
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            yield session
+        else:
+            with Session(self._db) as session:
+                if write:
+                    self._begin_immediate(session)
+                yield session
+
+    def _begin_immediate(self, session):
+        """Start a write transaction, retrying while the db is locked."""
+        for attempt in count():
+            try:
+                session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+                return
+            except OperationalError as e:
+                session.rollback()
+                if not is_busy(e) or attempt >= self.busy_retries:
+                    raise
+            time.sleep(backoff(attempt, self.busy_backoff))
+
+    def _commit(self, session):
+        """Mark the items as changed and commit, unless in a transaction."""
+        session.exec(_bump_version())
+        if getattr(self._local, "session", None) is None:
             session.commit()
+
+    def _existing(self, session, ids) -> list:
+        found = []
+        for chunk in _chunks(ids):
+            statement = select(Item.id).where(Item.id.in_(chunk))
+            found.extend(session.exec(statement))
+        return found
+
+    def create(self, item: Item) -> int:
+        with self._session(write=True) as session:
+            session.add(item)
+            self._commit(session)
             return item.id
 
-    def read(self, id: int):
-        with Session(self._db) as session:
-            statement = select(Item).where(Item.id == id)
+    def create_many(self, rows) -> list:
+        """Insert dicts of item fields in one transaction, return their ids."""
+        ids = []
+        with self._session(write=True) as session:
+            for chunk in _chunks(rows):
+                statement = insert(Item).returning(
+                    Item.id, sort_by_parameter_order=True
+                )
+                ids.extend(session.exec(statement, params=chunk).scalars())
+            self._commit(session)
+        return ids
+
+    def read(self, id: int, read_only=False):
+        with self._session() as session:
+            statement = _select(read_only).where(Item.id == id)
             item = session.exec(statement).first()
+            if read_only and item is not None:
+                return ItemRow._make(item)
             return item
 
-    def read_all(self):
-        with Session(self._db) as session:
-            statement = select(Item)
+    def read_all(self, owner=None, state=None):
+        with self._session() as session:
+            statement = _filter(select(Item), owner, state).order_by(Item.id)
             return session.exec(statement).fetchall()
 
+    def read_rows(self, owner=None, state=None, after=None, limit=None):
+        """Return ItemRow tuples instead of items."""
+        statement = _filter(_select(read_only=True), owner, state)
+        if after is not None:
+            statement = statement.where(Item.id > after)
+        statement = statement.order_by(Item.id).limit(limit)
+        with self._session() as session:
+            return list(map(ItemRow._make, session.exec(statement)))
+
+    def search(self, query, owner=None, state=None, limit=None) -> list:
+        """Return ItemRow tuples of the items matching an FTS5 query."""
+        with self._session() as session:
+            rows = session.exec(_search(query, owner, state, limit))
+            return list(map(ItemRow._make, rows))
+
+    def iter_all(self, owner=None, state=None, after=None, limit=None,
+                 batch_size=1000, read_only=False):
+        """Yield items ordered by id, fetching batch_size rows at a time."""
+        statement = _filter(_select(read_only), owner, state)
+        if after is not None:
+            statement = statement.where(Item.id > after)
+        statement = statement.order_by(Item.id).limit(limit)
+        statement = statement.execution_options(yield_per=batch_size)
+        with self._session() as session:
+            result = session.exec(statement)
+            if read_only:
+                result = map(ItemRow._make, result)
+            yield from result
+
     def update(self, id: int, mods) -> None:
-        with Session(self._db) as session:
+        with self._session(write=True) as session:
             statement = update(Item).where(Item.id==id).values(**mods)
             up = session.exec(statement)
-            session.commit()
+            self._commit(session)
             return up.rowcount
 
+    def update_many(self, ids, mods) -> list:
+        """Update items in one transaction, return the ids that were found.
+
+        Nothing is changed if some of the ids are not found.
+        """
+        ids = _unique(ids)
+        with self._session(write=True) as session:
+            found = self._existing(session, ids)
+            if len(found) == len(set(ids)):
+                for chunk in _chunks(ids):
+                    statement = update(Item).where(Item.id.in_(chunk)).values(**mods)
+                    session.exec(statement)
+                self._commit(session)
+        return found
+
+    def transition(self, state, ids=None, from_state=None, owner=None) -> list:
+        """Set the state of the items currently in from_state, in one UPDATE.
+
+        Restrict to ids and owner if given. Return the ids that changed.
+        """
+        statement = _transition(state, from_state, owner)
+        found = []
+        with self._session(write=True) as session:
+            if ids is None:
+                found.extend(session.exec(statement).scalars())
+            else:
+                for chunk in _chunks(_unique(ids)):
+                    chunk_statement = statement.where(Item.id.in_(chunk))
+                    found.extend(session.exec(chunk_statement).scalars())
+            if found:
+                self._commit(session)
+        return found
+
+    def delete_many(self, ids) -> list:
+        """Delete items in one transaction, return the ids that were found.
+
+        Nothing is deleted if some of the ids are not found.
+        """
+        ids = _unique(ids)
+        with self._session(write=True) as session:
+            found = self._existing(session, ids)
+            if len(found) == len(set(ids)):
+                for chunk in _chunks(ids):
+                    session.exec(delete(Item).where(Item.id.in_(chunk)))
+                self._commit(session)
+        return found
+
     def delete(self, id: int) -> None:
-        with Session(self._db) as session:
+        with self._session(write=True) as session:
             statement = delete(Item).where(Item.id==id)
             crs = session.exec(statement)
-            session.commit()
+            self._commit(session)
             return crs.rowcount
 
     def delete_all(self) -> None:
-        with Session(self._db) as session:
+        with self._session(write=True) as session:
             statement = delete(Item)
             crs = session.exec(statement)
-            session.commit()
+            self._commit(session)
             return crs.rowcount
 
-    def count(self) -> int:
-        return len(self.read_all())
+    def count(self, owner=None, state=None) -> int:
+        with self._session() as session:
+            return session.exec(_count(owner, state)).one()
+
+    def version(self) -> tuple:
+        """Return the number of writes so far and the time of the last one."""
+        with self._session() as session:
+            row = session.get(ItemsVersion, 1)
+            return row.version, row.modified
+
+    def changes(self, since=0, limit=None) -> tuple:
+        """Return the first and last seq of the change log, and the rows
+        of the items changed after since, see _changes().
+        """
+        with self._session() as session:
+            first, last = session.exec(_change_range()).one()
+            return first, last, session.exec(_changes(since, limit)).all()
+
+    def last_change(self) -> int:
+        with self._session() as session:
+            return session.exec(select(func.max(ItemChange.seq))).one() or 0
+
+    def count_by_state(self, owner=None) -> dict:
+        with self._session() as session:
+            return dict(session.exec(_count_by_state(owner)).all())
+
+    def summary(self, owner=None) -> list:
+        """Return (owner, state, count) tuples ordered by owner and state."""
+        with self._session() as session:
+            return session.exec(_summary(owner)).all()
 
     def close(self):
-        self._db.close()
+        self._db.dispose()
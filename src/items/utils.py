@@ -1,10 +1,17 @@
+import atexit
 import os
 import pathlib
-from contextlib import contextmanager
+import threading
+from contextlib import asynccontextmanager, contextmanager
 
 import items
 
 
+_dbs = {}
+_async_dbs = {}
+_dbs_lock = threading.Lock()
+
+
 def get_path():
     db_path_env = os.getenv("ITEMS_DB_DIR", "")
     if db_path_env:
@@ -14,9 +21,124 @@ def get_path():
     return db_path
 
 
+def get_profile():
+    return os.getenv("ITEMS_DB_PROFILE", "") or "default"
+
+
+def get_cache_options():
+    """Return the cache size and ttl set in the environment, if any."""
+    cache_size = int(os.getenv("ITEMS_DB_CACHE_SIZE", "") or 0)
+    cache_ttl = float(os.getenv("ITEMS_DB_CACHE_TTL", "") or 5.0)
+    return cache_size, cache_ttl
+
+
+def get_busy_options():
+    """Return the lock waiting options set in the environment as kwargs."""
+    options = {}
+    if os.getenv("ITEMS_DB_BUSY_TIMEOUT"):
+        options["busy_timeout"] = float(os.getenv("ITEMS_DB_BUSY_TIMEOUT"))
+    if os.getenv("ITEMS_DB_BUSY_RETRIES"):
+        options["busy_retries"] = int(os.getenv("ITEMS_DB_BUSY_RETRIES"))
+    if os.getenv("ITEMS_DB_BUSY_BACKOFF"):
+        options["busy_backoff"] = float(os.getenv("ITEMS_DB_BUSY_BACKOFF"))
+    return options
+
+
+def get_group_commit_options():
+    """Return the group commit options set in the environment as kwargs."""
+    options = {}
+    if os.getenv("ITEMS_DB_GROUP_COMMIT_SIZE"):
+        options["group_commit_size"] = int(os.getenv("ITEMS_DB_GROUP_COMMIT_SIZE"))
+    if os.getenv("ITEMS_DB_GROUP_COMMIT_DELAY"):
+        options["group_commit_delay"] = float(os.getenv("ITEMS_DB_GROUP_COMMIT_DELAY"))
+    return options
+
+
+def get_profiling_hosts():
+    """Return the client hosts that may ask for request profiles."""
+    hosts = os.getenv("ITEMS_PROFILING_HOSTS", "")
+    return {host.strip() for host in hosts.split(",") if host.strip()}
+
+
+def get_profiling_dir():
+    profiling_dir = os.getenv("ITEMS_PROFILING_DIR", "")
+    if profiling_dir:
+        return pathlib.Path(profiling_dir)
+    return get_path() / "profiles"
+
+
+def get_templates_compiled_dir():
+    """Return the directory of precompiled templates, or None to parse them."""
+    return os.getenv("ITEMS_TEMPLATES_COMPILED_DIR", "") or None
+
+
+def _new_items_db(db_path, use_async=False):
+    options = get_busy_options()
+    if use_async:
+        # Only the REST API adds items from many concurrent tasks.
+        options.update(get_group_commit_options())
+    cache_size, cache_ttl = get_cache_options()
+    if cache_size:
+        from items.cache import AsyncCachedItemsDB, CachedItemsDB
+
+        cls = AsyncCachedItemsDB if use_async else CachedItemsDB
+        return cls(db_path, cache_size=cache_size, cache_ttl=cache_ttl,
+                   profile=get_profile(), **options)
+    cls = items.AsyncItemsDB if use_async else items.ItemsDB
+    return cls(db_path, profile=get_profile(), **options)
+
+
+def open_items_db(db_path=None):
+    """Return the shared ItemsDB for db_path, creating it on first use.
+
+    The engine and its connection pool are kept for the lifetime of the
+    process, or until close_items_dbs() is called.
+    """
+    if db_path is None:
+        db_path = get_path()
+    with _dbs_lock:
+        key = os.fspath(db_path)
+        if key not in _dbs:
+            _dbs[key] = _new_items_db(db_path)
+        return _dbs[key]
+
+
+@atexit.register
+def close_items_dbs():
+    """Close all shared ItemsDB instances."""
+    with _dbs_lock:
+        for db in _dbs.values():
+            db.close()
+        _dbs.clear()
+
+
+async def open_async_items_db(db_path=None):
+    """Return the shared AsyncItemsDB for db_path, opening it on first use."""
+    if db_path is None:
+        db_path = get_path()
+    with _dbs_lock:
+        key = os.fspath(db_path)
+        if key not in _async_dbs:
+            _async_dbs[key] = _new_items_db(db_path, use_async=True)
+        db = _async_dbs[key]
+    await db.open()
+    return db
+
+
+async def close_async_items_dbs():
+    """Close all shared AsyncItemsDB instances."""
+    with _dbs_lock:
+        dbs = list(_async_dbs.values())
+        _async_dbs.clear()
+    for db in dbs:
+        await db.close()
+
+
 @contextmanager
 def items_db():
-    db_path = get_path()
-    db = items.ItemsDB(db_path)
-    yield db
-    db.close()
+    yield open_items_db()
+
+
+@asynccontextmanager
+async def async_items_db():
+    yield await open_async_items_db()
@@ -0,0 +1,92 @@
+"""
+Test Cases
+* AsyncItemsDB adds, gets, lists and counts items
+* AsyncItemsDB updates, starts, finishes and deletes items
+* AsyncItemsDB raises InvalidItemId like ItemsDB
+* AsyncItemsDB transitions states conditionally
+* AsyncItemsDB updates and deletes duplicate ids in different chunks once
+"""
+import asyncio
+
+import pytest
+
+from items import AsyncItemsDB, InvalidItemId, Item
+from items.sqldb import CHUNK_SIZE
+
+
+def run(coro_fn, db_path):
+    async def main():
+        db = AsyncItemsDB(db_path)
+        await db.open()
+        try:
+            return await coro_fn(db)
+        finally:
+            await db.close()
+
+    return asyncio.run(main())
+
+
+def test_add_and_list(items_db, db_path):
+    async def scenario(db):
+        i = await db.add_item(Item(summary="do something", owner="veit"))
+        ids = await db.add_items([Item(summary="one"), Item(summary="two")])
+        assert await db.get_item(i) == Item(summary="do something", owner="veit")
+        assert await db.count() == 3
+        assert await db.count(owner="veit") == 1
+        assert [t.id for t in await db.list_items()] == [i] + ids
+        assert [t.id async for t in db.iter_items(after=i)] == ids
+        assert [t.id for t in await db.list_items(limit=1)] == [i]
+
+    run(scenario, db_path)
+    assert items_db.count() == 3
+
+
+@pytest.mark.num_items(3)
+def test_modify(items_db, db_path):
+    ids = [t.id for t in items_db.list_items()]
+
+    async def scenario(db):
+        await db.update_item(ids[0], Item(owner="vsc", state=None))
+        await db.start(ids[1])
+        await db.finish(ids[2])
+        assert await db.count_by_state() == {"todo": 1, "in progress": 1, "done": 1}
+        await db.delete_item(ids[0])
+        await db.delete_items(ids[1:])
+        assert await db.count() == 0
+
+    run(scenario, db_path)
+
+
+def test_invalid_item_id(items_db, db_path):
+    async def scenario(db):
+        with pytest.raises(InvalidItemId):
+            await db.get_item(42)
+        with pytest.raises(InvalidItemId):
+            await db.finish(42)
+        with pytest.raises(InvalidItemId):
+            await db.delete_item(42)
+
+    run(scenario, db_path)
+
+
+def test_duplicate_ids_in_chunks(items_db, db_path):
+    ids = items_db.add_items(Item(summary=f"item {i}") for i in range(CHUNK_SIZE + 100))
+    duplicated = ids[:CHUNK_SIZE] + [ids[0]]
+
+    async def scenario(db):
+        await db.update_items(duplicated, Item(owner="vsc", state=None))
+        assert await db.count(owner="vsc") == CHUNK_SIZE
+        await db.delete_items(duplicated)
+        assert await db.count() == 100
+
+    run(scenario, db_path)
+
+
+def test_transition(items_db, db_path):
+    async def scenario(db):
+        i = await db.add_item(Item(summary="one"))
+        assert await db.finish(i, from_state="in progress") is False
+        assert await db.transition_items("done", from_state="todo") == [i]
+
+    run(scenario, db_path)
+    assert items_db.count(state="done") == 1
@@ -0,0 +1,86 @@
+"""
+Test Cases
+* `add_items` adds several items and returns their ids
+* `add_items` without summary adds nothing
+* `update_items` modifies several items
+* `update_items`/`delete_items` with a non-existent id change nothing
+* `delete_items` removes several items
+* duplicate ids in different chunks are updated and deleted once
+* writes in a `transaction` are committed together
+* an error in a `transaction` rolls back all of its writes
+"""
+import pytest
+
+from items import InvalidItemId, Item
+from items.api import MissingSummary
+from items.sqldb import CHUNK_SIZE
+
+
+def test_add_items(items_db):
+    orig = [Item(summary="one"), Item(summary="two", owner="veit")]
+    ids = items_db.add_items(orig)
+    assert len(ids) == 2
+    assert [items_db.get_item(i) for i in ids] == [
+        Item(summary="one", owner=""),
+        Item(summary="two", owner="veit"),
+    ]
+
+
+def test_add_items_missing_summary(items_db):
+    with pytest.raises(MissingSummary):
+        items_db.add_items([Item(summary="one"), Item(owner="veit")])
+    assert items_db.count() == 0
+
+
+@pytest.mark.num_items(3)
+def test_update_items(items_db):
+    ids = [i.id for i in items_db.list_items()]
+    items_db.update_items(ids[:2], Item(owner="vsc", state=None))
+    assert items_db.count(owner="vsc") == 2
+
+
+@pytest.mark.num_items(3)
+def test_update_items_non_existent(items_db):
+    ids = [i.id for i in items_db.list_items()]
+    with pytest.raises(InvalidItemId):
+        items_db.update_items(ids + [123], Item(owner="vsc", state=None))
+    assert items_db.count(owner="vsc") == 0
+
+
+@pytest.mark.num_items(3)
+def test_delete_items(items_db):
+    ids = [i.id for i in items_db.list_items()]
+    items_db.delete_items(ids[:2])
+    assert [i.id for i in items_db.list_items()] == ids[2:]
+
+
+@pytest.mark.num_items(3)
+def test_delete_items_non_existent(items_db):
+    ids = [i.id for i in items_db.list_items()]
+    with pytest.raises(InvalidItemId):
+        items_db.delete_items(ids + [123])
+    assert items_db.count() == 3
+
+
+def test_duplicate_ids_in_chunks(items_db):
+    ids = items_db.add_items(Item(summary=f"item {i}") for i in range(CHUNK_SIZE + 100))
+    items_db.update_items(ids[:CHUNK_SIZE] + [ids[0]], Item(owner="vsc", state=None))
+    assert items_db.count(owner="vsc") == CHUNK_SIZE
+    items_db.delete_items(ids[:CHUNK_SIZE] + [ids[0]])
+    assert items_db.count() == 100
+
+
+def test_transaction(items_db):
+    with items_db.transaction():
+        i = items_db.add_item(Item(summary="one"))
+        items_db.start(i)
+        assert items_db.get_item(i).state == "in progress"
+    assert items_db.get_item(i).state == "in progress"
+
+
+def test_transaction_rollback(items_db):
+    with pytest.raises(InvalidItemId):
+        with items_db.transaction():
+            items_db.add_item(Item(summary="one"))
+            items_db.delete_item(999)
+    assert items_db.count() == 0
@@ -0,0 +1,77 @@
+"""
+Test Cases
+* a write waits for another connection to release the write lock
+* a write fails after busy_retries when the lock is never released
+* the schema version is stored, and an up to date schema is not rewritten
+* busy options are read from the environment
+"""
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import items
+from items.sqldb import SCHEMA_VERSION
+from items.utils import get_busy_options
+
+
+def lock(db_path):
+    """Take the write lock of the db with another connection."""
+    con = sqlite3.connect(db_path / ".items_db.db", isolation_level=None,
+                          check_same_thread=False)
+    con.execute("BEGIN IMMEDIATE")
+    return con
+
+
+def test_busy_retry(tmp_path):
+    db = items.ItemsDB(tmp_path, busy_timeout=0.01, busy_retries=20,
+                       busy_backoff=0.01)
+    con = lock(tmp_path)
+    timer = threading.Timer(0.1, con.rollback)
+    timer.start()
+    try:
+        i = db.add_item(items.Item(summary="do something"))
+    finally:
+        timer.join()
+        con.close()
+    assert db.get_item(i).summary == "do something"
+    db.close()
+
+
+def test_busy_retries_exhausted(tmp_path):
+    db = items.ItemsDB(tmp_path, busy_timeout=0.01, busy_retries=2,
+                       busy_backoff=0.01)
+    con = lock(tmp_path)
+    try:
+        with pytest.raises(OperationalError):
+            db.add_item(items.Item(summary="do something"))
+        # Reads don't need the write lock.
+        assert db.count() == 0
+    finally:
+        con.close()
+    db.close()
+
+
+def test_schema_version(tmp_path):
+    items.ItemsDB(tmp_path).close()
+    con = sqlite3.connect(tmp_path / ".items_db.db", isolation_level=None)
+    assert con.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    # Opening an up to date db must not need the write lock.
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        db = items.ItemsDB(tmp_path, busy_timeout=0.01, busy_retries=0)
+        assert db.count() == 0
+        db.close()
+    finally:
+        con.close()
+
+
+def test_busy_options(monkeypatch):
+    assert get_busy_options() == {}
+    monkeypatch.setenv("ITEMS_DB_BUSY_TIMEOUT", "0.5")
+    monkeypatch.setenv("ITEMS_DB_BUSY_RETRIES", "3")
+    monkeypatch.setenv("ITEMS_DB_BUSY_BACKOFF", "0.1")
+    assert get_busy_options() == {
+        "busy_timeout": 0.5, "busy_retries": 3, "busy_backoff": 0.1,
+    }
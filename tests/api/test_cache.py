@@ -0,0 +1,135 @@
+"""
+Test Cases
+* repeated reads are served from the cache
+* read_only iter_items reads its pages through the cache
+* writes invalidate the affected entries
+* entries expire after the ttl
+* the cache is bounded in size
+"""
+import asyncio
+
+import pytest
+
+from items import InvalidItemId, Item
+from items.cache import MISSING, AsyncCachedItemsDB, CachedItemsDB, ItemsCache
+
+
+@pytest.fixture()
+def cached_db(items_db, db_path):
+    db = CachedItemsDB(db_path)
+    yield db
+    db.close()
+
+
+def test_reads_are_cached(cached_db):
+    i = cached_db.add_item(Item(summary="do something", owner="veit"))
+    for _ in range(2):
+        assert cached_db.get_item(i) == Item(summary="do something", owner="veit")
+        assert len(cached_db.list_items(owner="veit")) == 1
+        assert cached_db.count() == 1
+    assert cached_db.cache.stats() == {"hits": 3, "misses": 3, "size": 3}
+
+
+@pytest.mark.parametrize(
+    "write",
+    [
+        lambda db, i: db.add_item(Item(summary="other")),
+        lambda db, i: db.update_item(i, Item(summary="changed", state=None)),
+        lambda db, i: db.start(i),
+        lambda db, i: db.finish(i),
+        lambda db, i: db.delete_item(i),
+        lambda db, i: db.delete_items([i]),
+        lambda db, i: db.delete_all(),
+    ],
+)
+def test_writes_invalidate(cached_db, items_db, write):
+    i = cached_db.add_item(Item(summary="do something"))
+    cached_db.list_items()
+    cached_db.count()
+    write(cached_db, i)
+    assert cached_db.list_items() == items_db.list_items()
+    assert cached_db.count() == items_db.count()
+    assert cached_db.cache.hits == 0
+    try:
+        assert cached_db.get_item(i) == items_db.get_item(i)
+    except InvalidItemId:
+        with pytest.raises(InvalidItemId):
+            items_db.get_item(i)
+
+
+def test_update_keeps_other_items(cached_db):
+    i = cached_db.add_item(Item(summary="one"))
+    j = cached_db.add_item(Item(summary="two"))
+    cached_db.get_item(i)
+    cached_db.get_item(j)
+    cached_db.finish(i)
+    cached_db.get_item(j)
+    assert cached_db.cache.hits == 1
+
+
+def test_iter_items_cached(cached_db):
+    ids = cached_db.add_items(Item(summary=f"item {i}") for i in range(5))
+    for _ in range(2):
+        rows = list(cached_db.iter_items(batch_size=2, read_only=True))
+        assert [row.id for row in rows] == ids
+        assert [row.id for row in cached_db.iter_items(limit=3, batch_size=2,
+                                                       read_only=True)] == ids[:3]
+    # Pages of 2, 2 and 1 rows, then with the limit the same first page and
+    # one of 1 row.
+    assert cached_db.cache.stats() == {"hits": 6, "misses": 4, "size": 4}
+    assert [item.id for item in cached_db.iter_items(after=ids[2])] == ids[3:]
+
+
+def test_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("items.cache.time.monotonic", lambda: now[0])
+    cache = ItemsCache(ttl=5.0)
+    cache.put(("count", None, None), 1)
+    assert cache.get(("count", None, None)) == 1
+    now[0] += 6
+    assert cache.get(("count", None, None)) is MISSING
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 0}
+
+
+def test_lru_eviction():
+    cache = ItemsCache(maxsize=2)
+    cache.put(("item", 1), "a")
+    cache.put(("item", 2), "b")
+    cache.get(("item", 1))
+    cache.put(("item", 3), "c")
+    assert cache.get(("item", 1)) == "a"
+    assert cache.get(("item", 3)) == "c"
+    assert cache.get(("item", 2)) is MISSING
+
+
+def test_async_cached(items_db, db_path):
+    async def main():
+        db = AsyncCachedItemsDB(db_path)
+        await db.open()
+        i = await db.add_item(Item(summary="do something"))
+        assert await db.count() == 1
+        assert await db.count() == 1
+        await db.finish(i)
+        assert await db.count(state="done") == 1
+        assert (await db.get_item(i)).state == "done"
+        await db.close()
+        return db.cache.stats()
+
+    assert asyncio.run(main())["hits"] == 1
+
+
+def test_async_iter_items_cached(items_db, db_path):
+    ids = items_db.add_items(Item(summary=f"item {i}") for i in range(3))
+
+    async def main():
+        db = AsyncCachedItemsDB(db_path)
+        await db.open()
+        for _ in range(2):
+            rows = [row async for row in db.iter_items(batch_size=2, read_only=True)]
+            assert [row.id for row in rows] == ids
+        items = [item async for item in db.iter_items(after=ids[0])]
+        assert [item.id for item in items] == ids[1:]
+        await db.close()
+        return db.cache.stats()
+
+    assert asyncio.run(main())["hits"] == 2
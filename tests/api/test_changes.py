@@ -0,0 +1,63 @@
+"""
+Test Cases
+* adding, updating and deleting items are logged as changes
+* each changed item is reported once, with its current columns
+* changes can be read in pages with `limit`
+* a `since` newer than the log asks for a reset
+* a `since` older than the log asks for a reset
+"""
+import sqlite3
+
+from items import Item, ItemRow
+
+
+def test_changes(items_db):
+    start = items_db.last_change()
+    i = items_db.add_item(Item(summary="one"))
+    j, k = items_db.add_items([Item(summary="two"), Item(summary="three")])
+    changes = items_db.changes(start)
+    assert changes.seq == items_db.last_change() == start + 3
+    assert not changes.reset
+    assert [row.id for row in changes.items] == [i, j, k]
+    assert changes.deleted == []
+
+
+def test_changes_once_per_item(items_db):
+    i, j = items_db.add_items([Item(summary="one"), Item(summary="two")])
+    since = items_db.last_change()
+    items_db.start(i)
+    items_db.delete_item(j)
+    items_db.finish(i)
+    changes = items_db.changes(since)
+    assert changes.seq == since + 3
+    assert changes.items == [ItemRow(i, "one", "", "done")]
+    assert changes.deleted == [j]
+
+
+def test_changes_limit(items_db):
+    since = items_db.last_change()
+    ids = items_db.add_items(Item(summary=str(n)) for n in range(3))
+    first = items_db.changes(since, limit=2)
+    assert [row.id for row in first.items] == ids[:2]
+    rest = items_db.changes(first.seq, limit=2)
+    assert [row.id for row in rest.items] == ids[2:]
+    assert items_db.changes(rest.seq).items == []
+
+
+def test_changes_since_future(items_db):
+    changes = items_db.changes(items_db.last_change() + 10)
+    assert changes.reset
+    assert changes.seq == items_db.last_change()
+
+
+def test_changes_pruned(items_db, db_path):
+    items_db.add_item(Item(summary="one"))
+    since = items_db.last_change()
+    items_db.add_items([Item(summary="two"), Item(summary="three")])
+    assert not items_db.changes(since).reset
+    con = sqlite3.connect(db_path / ".items_db.db")
+    con.execute("DELETE FROM item_change WHERE seq <= ?", (since + 1,))
+    con.commit()
+    con.close()
+    assert items_db.changes(since).reset
+    assert not items_db.changes(since + 1).reset
@@ -3,9 +3,13 @@ Test Cases
 * count from an empty database
 * count with one item
 * count with more than one item
+* count filtered by owner and state
+* count grouped by state
 """
 import pytest
 
+from items import Item
+
 
 def test_count_no_items(items_db):
     assert items_db.count() == 0
@@ -19,3 +23,30 @@ def test_count_one_item(items_db):
 @pytest.mark.num_items(3)
 def test_count_three_items(items_db):
     assert items_db.count() == 3
+
+
+@pytest.fixture()
+def db_filled(items_db):
+    items_db.add_item(Item(summary="zero", owner="veit", state="todo"))
+    items_db.add_item(Item(summary="one", owner="veit", state="done"))
+    items_db.add_item(Item(summary="two", owner="vsc", state="done"))
+    return items_db
+
+
+@pytest.mark.parametrize(
+    "owner_, state_, expected",
+    [
+        ("veit", None, 2),
+        ("vsc", None, 1),
+        (None, "done", 2),
+        ("veit", "todo", 1),
+        ("nobody", None, 0),
+    ],
+)
+def test_count_filter(db_filled, owner_, state_, expected):
+    assert db_filled.count(owner=owner_, state=state_) == expected
+
+
+def test_count_by_state(db_filled):
+    assert db_filled.count_by_state() == {"todo": 1, "done": 2}
+    assert db_filled.count_by_state(owner="vsc") == {"done": 1}
@@ -0,0 +1,25 @@
+"""
+Test Cases
+* every write increases the data version
+* reads leave the data version alone
+"""
+from items import Item
+
+
+def test_writes_bump_version(items_db):
+    version, modified = items_db.data_version()
+    i = items_db.add_item(Item(summary="do something"))
+    items_db.finish(i)
+    items_db.add_items([Item(summary="one"), Item(summary="two")])
+    items_db.delete_item(i)
+    new_version, new_modified = items_db.data_version()
+    assert new_version == version + 4
+    assert new_modified >= modified
+
+
+def test_reads_keep_version(items_db):
+    items_db.add_item(Item(summary="do something"))
+    version = items_db.data_version()
+    items_db.list_items()
+    items_db.count()
+    assert items_db.data_version() == version
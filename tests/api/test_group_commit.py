@@ -0,0 +1,104 @@
+"""
+Test Cases
+* concurrent add_item calls are committed in groups, each gets its id
+* a full group is written without waiting for the delay
+* a failed group commit raises the error to every caller of the group
+* a missing summary is raised before the item is queued
+* close() writes the items still queued
+"""
+import asyncio
+
+import pytest
+
+from items import AsyncItemsDB, Item
+from items.api import MissingSummary
+from items.group_commit import GroupCommit
+
+
+def run(coro_fn, db_path, **kwargs):
+    async def main():
+        db = AsyncItemsDB(db_path, **kwargs)
+        await db.open()
+        try:
+            return await coro_fn(db)
+        finally:
+            await db.close()
+
+    return asyncio.run(main())
+
+
+def counting(db):
+    """Count the transactions of the group commit of db."""
+    calls = []
+    create_many = db._group_commit.create_many
+
+    async def create_many_counted(rows):
+        calls.append(len(rows))
+        return await create_many(rows)
+
+    db._group_commit.create_many = create_many_counted
+    return calls
+
+
+def test_group_commit(items_db, db_path):
+    async def scenario(db):
+        calls = counting(db)
+        ids = await asyncio.gather(*(db.add_item(Item(summary=f"item {i}"))
+                                     for i in range(25)))
+        assert calls == [10, 10, 5]
+        return ids
+
+    ids = run(scenario, db_path, group_commit_size=10, group_commit_delay=0.01)
+    assert len(set(ids)) == 25
+    assert [items_db.get_item(i).summary for i in ids] == [
+        f"item {i}" for i in range(25)
+    ]
+
+
+def test_full_group_not_delayed():
+    async def create_many(rows):
+        return list(range(len(rows)))
+
+    async def scenario():
+        group_commit = GroupCommit(create_many, max_items=2, max_delay=60)
+        return await asyncio.wait_for(
+            asyncio.gather(group_commit.add("a"), group_commit.add("b")), 1
+        )
+
+    assert asyncio.run(scenario()) == [0, 1]
+
+
+def test_group_commit_error():
+    async def create_many(rows):
+        raise RuntimeError("disk full")
+
+    async def scenario():
+        group_commit = GroupCommit(create_many, max_items=10, max_delay=0.01)
+        return await asyncio.gather(group_commit.add("a"), group_commit.add("b"),
+                                    return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert [str(e) for e in errors] == ["disk full", "disk full"]
+
+
+def test_missing_summary(items_db, db_path):
+    async def scenario(db):
+        with pytest.raises(MissingSummary):
+            await db.add_item(Item(owner="veit"))
+        assert db._group_commit._pending == []
+
+    run(scenario, db_path, group_commit_size=10)
+
+
+def test_close_flushes(items_db, db_path):
+    async def main():
+        db = AsyncItemsDB(db_path, group_commit_size=10, group_commit_delay=60)
+        await db.open()
+        task = asyncio.create_task(db.add_item(Item(summary="late")))
+        await asyncio.sleep(0)  # let the item be queued
+        await db.close()
+        assert task.done()
+        return await task
+
+    i = asyncio.run(main())
+    assert items_db.get_item(i).summary == "late"
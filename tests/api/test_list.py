@@ -2,10 +2,12 @@
 Test Cases
 * list from an empty database
 * list from a non-empty database
+* list in pages and as an iterator
+* list and get read-only rows
 """
 import pytest
 
-from items import Item
+from items import Item, ItemRow
 
 
 def test_list_no_items(items_db):
@@ -80,3 +82,31 @@ def test_list_filter(db_filled, known_set, owner_, state_, expected_indices):
     assert len(result) == len(expected_indices)
     for i in expected_indices:
         assert known_set[i] in result
+
+
+def test_list_pages(db_filled, known_set):
+    page = db_filled.list_items(limit=4)
+    assert len(page) == 4
+    rest = db_filled.list_items(after=page[-1].id)
+    assert page + rest == known_set
+    assert [i.id for i in page + rest] == sorted(i.id for i in page + rest)
+
+
+def test_iter_items_filter(db_filled, known_set):
+    result = list(db_filled.iter_items(owner="veit", batch_size=2))
+    assert result == known_set[:3]
+
+
+def test_list_read_only(db_filled, known_set):
+    rows = db_filled.list_items(owner="vsc", read_only=True)
+    assert all(isinstance(row, ItemRow) for row in rows)
+    assert [row.summary for row in rows] == ["three", "four", "five"]
+    assert rows == db_filled.list_items(owner="vsc")
+    assert rows == db_filled.list_rows(owner="vsc")
+
+
+def test_get_read_only(db_filled):
+    item = db_filled.list_items()[0]
+    row = db_filled.get_item(item.id, read_only=True)
+    assert row == ItemRow(item.id, "zero", "veit", "todo")
+    assert item == row
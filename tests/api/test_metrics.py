@@ -0,0 +1,79 @@
+"""
+Test Cases
+* statements are counted by kind
+* ItemsDB calls are timed per method
+* failed statements are recorded apart, by kind and error
+* statements over the threshold are logged as slow
+* metrics are rendered in the Prometheus text format
+"""
+import logging
+import sqlite3
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import items
+from items import Item
+from items.metrics import METRICS, Metrics, to_prometheus
+
+
+@pytest.fixture()
+def metrics():
+    return Metrics()
+
+
+def test_statements(items_db):
+    items_db.count()
+    before = METRICS.statements["SELECT"].count
+    items_db.count()
+    assert METRICS.statements["SELECT"].count == before + 1
+
+
+def test_methods(items_db):
+    items_db.add_item(Item(summary="one"))
+    histogram = METRICS.methods["add_item"]
+    assert histogram.count >= 1
+    assert histogram.sum > 0
+
+
+def test_failed_statements(tmp_path):
+    db = items.ItemsDB(tmp_path, busy_timeout=0.01, busy_retries=1,
+                       busy_backoff=0.001)
+    key = ("BEGIN", "OperationalError")
+    before = getattr(METRICS.failed_statements.get(key), "count", 0)
+    con = sqlite3.connect(tmp_path / ".items_db.db", isolation_level=None)
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(OperationalError):
+            db.add_item(Item(summary="locked out"))
+    finally:
+        con.close()
+    assert METRICS.failed_statements[key].count == before + 2
+    with db._db._db.connect() as conn:
+        assert not conn.info.get("items_query_start")
+    db.close()
+
+
+def test_slow_query(metrics, caplog):
+    metrics.slow_query_seconds = 0.01
+    with caplog.at_level(logging.WARNING, logger="items.sql"):
+        metrics.observe_statement("SELECT 1", 0.001)
+        metrics.observe_statement("SELECT 2", 0.02)
+    assert metrics.slow_statements == 1
+    assert [r.getMessage() for r in caplog.records] == ["Slow query (20.0 ms): SELECT 2"]
+
+
+def test_prometheus(metrics):
+    metrics.observe_statement("select * from item", 0.002)
+    metrics.observe_method("count", 0.003)
+    metrics.observe_statement("BEGIN IMMEDIATE", 0.01, "OperationalError")
+    text = to_prometheus(metrics)
+    assert '# TYPE items_sql_statement_seconds histogram' in text
+    assert 'items_sql_statement_seconds_bucket{statement="SELECT",le="0.001"} 0' in text
+    assert 'items_sql_statement_seconds_bucket{statement="SELECT",le="0.0025"} 1' in text
+    assert 'items_sql_statement_seconds_bucket{statement="SELECT",le="+Inf"} 1' in text
+    assert 'items_sql_statement_seconds_count{statement="SELECT"} 1' in text
+    assert 'items_db_call_seconds_count{method="count"} 1' in text
+    assert "items_sql_slow_statements_total 0" in text
+    assert ('items_sql_failed_statement_seconds_count'
+            '{statement="BEGIN",error="OperationalError"} 1') in text
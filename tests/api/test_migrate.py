@@ -0,0 +1,31 @@
+"""
+Test Cases
+* opening a db created without indexes adds the indexes
+* items in an old db are kept and can be filtered
+"""
+import sqlite3
+
+import items
+
+
+def test_migrate_adds_indexes(tmp_path):
+    con = sqlite3.connect(tmp_path / ".items_db.db")
+    con.execute(
+        "CREATE TABLE item (id INTEGER PRIMARY KEY, summary VARCHAR, "
+        "owner VARCHAR, state VARCHAR NOT NULL)"
+    )
+    con.execute("INSERT INTO item VALUES (1, 'old', 'veit', 'todo')")
+    con.commit()
+    con.close()
+
+    db = items.ItemsDB(tmp_path)
+    assert [i.summary for i in db.list_items(owner="veit", state="todo")] == ["old"]
+    db.close()
+
+    con = sqlite3.connect(tmp_path / ".items_db.db")
+    indexes = {
+        row[0]
+        for row in con.execute("SELECT name FROM sqlite_master WHERE type='index'")
+    }
+    con.close()
+    assert {"ix_item_owner", "ix_item_state", "ix_item_owner_state"} <= indexes
@@ -0,0 +1,34 @@
+"""
+Test Cases
+* open_items_db returns the same ItemsDB for the same path
+* close_items_dbs closes the shared ItemsDB instances
+* ITEMS_DB_CACHE_SIZE turns on the read cache
+"""
+from items.cache import CachedItemsDB
+from items.utils import close_items_dbs, open_items_db
+
+
+def test_open_same_path(tmp_path):
+    db = open_items_db(tmp_path)
+    assert open_items_db(tmp_path) is db
+    assert db.path() == tmp_path
+
+
+def test_open_different_paths(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    assert open_items_db(tmp_path / "a") is not open_items_db(tmp_path / "b")
+
+
+def test_close_all(tmp_path):
+    db = open_items_db(tmp_path)
+    close_items_dbs()
+    assert open_items_db(tmp_path) is not db
+
+
+def test_open_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("ITEMS_DB_CACHE_SIZE", "10")
+    db = open_items_db(tmp_path)
+    assert isinstance(db, CachedItemsDB)
+    assert db.cache.maxsize == 10
+    close_items_dbs()
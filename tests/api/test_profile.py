@@ -0,0 +1,40 @@
+"""
+Test Cases
+* the default profile keeps SQLite's rollback journal
+* the fast profile switches to WAL and applies its pragmas
+* an unknown profile is rejected
+"""
+import sqlite3
+
+import pytest
+
+import items
+
+
+def journal_mode(db_path):
+    con = sqlite3.connect(db_path / ".items_db.db")
+    mode = con.execute("PRAGMA journal_mode").fetchone()[0]
+    con.close()
+    return mode
+
+
+def test_default_profile(tmp_path):
+    db = items.ItemsDB(tmp_path)
+    db.add_item(items.Item(summary="do something"))
+    db.close()
+    assert journal_mode(tmp_path) == "delete"
+
+
+def test_fast_profile(tmp_path):
+    db = items.ItemsDB(tmp_path, profile="fast")
+    db.add_item(items.Item(summary="do something"))
+    with db._db._db.connect() as con:
+        assert con.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+        assert con.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+    db.close()
+    assert journal_mode(tmp_path) == "wal"
+
+
+def test_unknown_profile(tmp_path):
+    with pytest.raises(ValueError):
+        items.ItemsDB(tmp_path, profile="turbo")
@@ -0,0 +1,68 @@
+"""
+Test Cases
+* search matches words and word prefixes, best matches first
+* search filtered by owner and state, with a limit
+* search without words finds nothing
+* updated and deleted items are updated in and removed from the index
+* opening an old db indexes its items
+"""
+import sqlite3
+
+import items
+from items import Item
+
+
+def add(items_db):
+    return items_db.add_items([
+        Item(summary="Update pytest section", owner="veit"),
+        Item(summary="pytest fixtures pytest marks", owner="vsc"),
+        Item(summary="Update cibuildwheel section", owner="veit", state="done"),
+    ])
+
+
+def test_search(items_db):
+    ids = add(items_db)
+    assert [r.id for r in items_db.search("pytest")] == [ids[1], ids[0]]
+    assert [r.id for r in items_db.search("sec upd")] == [ids[0], ids[2]]
+    assert items_db.search("cibuild")[0] == items.ItemRow(
+        ids[2], "Update cibuildwheel section", "veit", "done"
+    )
+
+
+def test_search_filter(items_db):
+    ids = add(items_db)
+    assert [r.id for r in items_db.search("update", owner="veit", state="todo")] == [
+        ids[0]
+    ]
+    assert len(items_db.search("update", limit=1)) == 1
+
+
+def test_search_no_words(items_db):
+    add(items_db)
+    assert items_db.search(' "*" ') == []
+
+
+def test_search_update_delete(items_db):
+    ids = add(items_db)
+    items_db.update_item(ids[0], Item(summary="Rewrite tox section"))
+    assert [r.id for r in items_db.search("tox")] == [ids[0]]
+    assert [r.id for r in items_db.search("pytest")] == [ids[1]]
+    items_db.delete_item(ids[0])
+    assert items_db.search("tox") == []
+    items_db.delete_all()
+    assert items_db.search("section") == []
+
+
+def test_search_old_db(tmp_path):
+    con = sqlite3.connect(tmp_path / ".items_db.db")
+    con.execute(
+        "CREATE TABLE item (id INTEGER PRIMARY KEY, summary VARCHAR, "
+        "owner VARCHAR, state VARCHAR NOT NULL)"
+    )
+    con.execute("INSERT INTO item VALUES (1, 'old item', 'veit', 'todo')")
+    con.commit()
+    con.close()
+
+    db = items.ItemsDB(tmp_path)
+    assert [r.id for r in db.search("old")] == [1]
+    db.close()
@@ -0,0 +1,65 @@
+"""
+Test Cases
+* summary of an empty db
+* summary counts items per owner and state
+* summary follows updates, state transitions and deletes
+* summary filtered by owner
+* opening an old db fills in the summary
+"""
+import sqlite3
+
+import items
+from items import Item
+
+
+def test_summary_empty(items_db):
+    assert items_db.summary() == {}
+
+
+def test_summary(items_db):
+    items_db.add_items([
+        Item(summary="one", owner="veit"),
+        Item(summary="two", owner="veit", state="done"),
+        Item(summary="three"),
+    ])
+    assert items_db.summary() == {"": {"todo": 1}, "veit": {"done": 1, "todo": 1}}
+
+
+def test_summary_follows_writes(items_db):
+    i, j = items_db.add_items([Item(summary="one", owner="veit"),
+                               Item(summary="two", owner="veit")])
+    items_db.start(i)
+    items_db.update_item(j, Item(owner="vsc", state=None))
+    assert items_db.summary() == {"veit": {"in progress": 1}, "vsc": {"todo": 1}}
+    items_db.delete_item(i)
+    assert items_db.summary() == {"vsc": {"todo": 1}}
+    items_db.transition_items("done", from_state="todo")
+    assert items_db.summary() == {"vsc": {"done": 1}}
+    items_db.delete_all()
+    assert items_db.summary() == {}
+
+
+def test_summary_owner(items_db):
+    items_db.add_items([Item(summary="one", owner="veit"),
+                        Item(summary="two", owner="vsc")])
+    assert items_db.summary(owner="vsc") == {"vsc": {"todo": 1}}
+
+
+def test_summary_old_db(tmp_path):
+    con = sqlite3.connect(tmp_path / ".items_db.db")
+    con.execute(
+        "CREATE TABLE item (id INTEGER PRIMARY KEY, summary VARCHAR, "
+        "owner VARCHAR, state VARCHAR NOT NULL)"
+    )
+    con.executemany("INSERT INTO item VALUES (?, ?, ?, ?)", [
+        (1, "old", "veit", "todo"),
+        (2, "older", "veit", "todo"),
+        (3, "oldest", None, "done"),
+    ])
+    con.commit()
+    con.close()
+
+    db = items.ItemsDB(tmp_path)
+    assert db.summary() == {"": {"done": 1}, "veit": {"todo": 2}}
+    assert db.count() == 3
+    db.close()
@@ -0,0 +1,69 @@
+"""
+Test Cases
+* `transition` sets the state if the item is in the expected state
+* `transition` leaves the item alone if it is in another state
+* `transition` of a non-existent id
+* `finish` with `from_state`
+* `transition_items` for all items of an owner in a state
+* `transition_items` restricted to ids
+* `transition_items` with several from states
+"""
+import pytest
+
+from items import InvalidItemId, Item
+
+
+def test_transition(items_db):
+    i = items_db.add_item(Item(summary="one", state="in progress"))
+    assert items_db.transition(i, "done", from_state="in progress") is True
+    assert items_db.get_item(i).state == "done"
+
+
+def test_transition_wrong_state(items_db):
+    i = items_db.add_item(Item(summary="one", state="todo"))
+    version = items_db.data_version()
+    assert items_db.transition(i, "done", from_state="in progress") is False
+    assert items_db.get_item(i).state == "todo"
+    assert items_db.data_version() == version
+
+
+def test_transition_non_existent(items_db):
+    with pytest.raises(InvalidItemId):
+        items_db.transition(42, "done", from_state="todo")
+
+
+def test_finish_from_state(items_db):
+    i = items_db.add_item(Item(summary="one"))
+    assert items_db.finish(i, from_state="in progress") is False
+    assert items_db.start(i, from_state="todo") is True
+    assert items_db.finish(i, from_state="in progress") is True
+    assert items_db.get_item(i).state == "done"
+
+
+def test_transition_items_owner(items_db):
+    ids = items_db.add_items([
+        Item(summary="one", owner="veit", state="in progress"),
+        Item(summary="two", owner="veit", state="todo"),
+        Item(summary="three", owner="vsc", state="in progress"),
+        Item(summary="four", owner="veit", state="in progress"),
+    ])
+    found = items_db.transition_items("done", from_state="in progress", owner="veit")
+    assert found == [ids[0], ids[3]]
+    assert items_db.count_by_state() == {"done": 2, "in progress": 1, "todo": 1}
+
+
+def test_transition_items_ids(items_db):
+    ids = items_db.add_items(Item(summary=str(n)) for n in range(3))
+    assert items_db.transition_items("in progress", item_ids=ids[1:]) == ids[1:]
+    assert items_db.get_item(ids[0]).state == "todo"
+
+
+def test_transition_items_from_states(items_db):
+    ids = items_db.add_items([
+        Item(summary="one", state="todo"),
+        Item(summary="two", state="in progress"),
+        Item(summary="three", state="done"),
+    ])
+    found = items_db.transition_items("todo", from_state=["in progress", "done"])
+    assert found == ids[1:]
+    assert items_db.count(state="todo") == 3
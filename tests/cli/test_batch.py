@@ -0,0 +1,76 @@
+import items
+from items import Item
+
+from .conftest import runner
+
+
+def test_batch_file(items_db, items_cli, tmp_path):
+    i = items_db.add_item(Item(summary="first"))
+    path = tmp_path / "commands.txt"
+    path.write_text(
+        f"add second -o veit\n"
+        f"\n"
+        f"# a comment\n"
+        f"update {i} -s 'first item'\n"
+        f"start {i}\n"
+    )
+    assert items_cli(f"batch {path}") == "1: ok\n4: ok\n5: ok"
+    assert items_db.list_items() == [
+        Item(summary="first item", owner="", state="in progress"),
+        Item(summary="second", owner="veit", state="todo"),
+    ]
+
+
+def test_batch_stdin(items_db, items_cli):
+    result = runner.invoke(items.cli.app, ["batch", "--chunk-size", "1"],
+                           input="add one\nadd two\n")
+    assert result.stdout == "1: ok\n2: ok\n"
+    assert items_db.count() == 2
+
+
+def test_batch_errors(items_db, items_cli, tmp_path):
+    i = items_db.add_item(Item(summary="first"))
+    path = tmp_path / "commands.txt"
+    path.write_text(
+        f"finish {i}\n"
+        f"delete 999\n"
+        f"start x\n"
+        f"list\n"
+        f"add ''\n"
+        f"add 'unbalanced\n"
+    )
+    output = items_cli(f"batch {path}").splitlines()
+    assert output[0] == "1: ok"
+    assert output[1] == "2: Error: Invalid item id 999"
+    assert output[2].startswith("3: Error: Invalid value for 'item_id'")
+    assert output[3] == "4: Error: Unknown command 'list'."
+    assert output[4] == "5: Error: Missing summary."
+    assert output[5].startswith("6: Error: ")
+    assert items_db.get_item(i).state == "done"
+    assert items_db.count() == 1
+
+
+def test_batch_help(items_db, items_cli, tmp_path):
+    path = tmp_path / "commands.txt"
+    path.write_text("add one\nadd --help\nadd two\n")
+    output = items_cli(f"batch {path}")
+    assert output.startswith("1: ok\n2: Usage: add")
+    assert output.endswith("3: ok")
+    assert items_db.count() == 2
+
+
+def test_batch_unexpected_error(items_db, items_cli, tmp_path, monkeypatch):
+    def finish(self, item_id, from_state=None):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(items.ItemsDB, "finish", finish)
+    path = tmp_path / "commands.txt"
+    path.write_text("add one\nadd two\nfinish 1\nadd three\n")
+    result = runner.invoke(items.cli.app, ["batch", str(path), "--chunk-size", "2"])
+    assert result.exit_code == 1
+    assert result.stdout == (
+        "1: ok\n2: ok\n"
+        "3: Error: RuntimeError('boom')\n"
+        "Error: Lines 3 to 4 rolled back.\n"
+    )
+    assert items_db.count() == 2
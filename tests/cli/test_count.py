@@ -1,6 +1,17 @@
 import pytest
 
+from items import Item
+
 
 @pytest.mark.num_items(3)
 def test_count(items_cli):
     assert items_cli("count") == "3"
+
+
+def test_count_filter(items_db, items_cli):
+    items_db.add_item(Item(summary="one", owner="veit"))
+    i = items_db.add_item(Item(summary="two", owner="vsc"))
+    items_db.start(i)
+    assert items_cli("count -o veit") == "1"
+    assert items_cli("count -s 'in progress'") == "1"
+    assert items_cli("count --by-state") == "in progress: 1\ntodo: 1"
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+import items
+from items import Item, daemon
+
+
+@pytest.fixture()
+def running_daemon(items_cli, db_path):
+    socket_path = db_path / daemon.SOCKET_NAME
+    thread = threading.Thread(target=daemon.serve)
+    thread.start()
+    for _ in range(100):
+        if daemon.is_running(socket_path):
+            break
+        time.sleep(0.01)
+    yield socket_path
+    daemon.stop()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_forward(running_daemon, items_db, capsys):
+    items_db.add_item(Item(summary="do something"))
+    assert daemon.forward(["count"]) == 0
+    assert daemon.forward(["add", "do", "more"]) == 0
+    assert daemon.forward(["count"]) == 0
+    assert capsys.readouterr().out == "1\n2\n"
+
+
+def test_forward_errors(running_daemon, capsys):
+    assert daemon.forward(["finish", "42"]) == 0
+    assert "Error: Invalid item id 42" in capsys.readouterr().out
+    assert daemon.forward(["no-such-command"]) == 2
+
+
+def test_no_daemon(items_cli, db_path):
+    assert not daemon.is_running(db_path / daemon.SOCKET_NAME)
+    assert daemon.forward(["count"]) is None
+
+
+def test_stop_without_daemon(items_cli):
+    assert items_cli("daemon --stop") == "Error: No daemon is running."
+
+
+def test_forward_exception(running_daemon, capsys, monkeypatch):
+    def count(self, owner=None, state=None):
+        raise RuntimeError("disk I/O error")
+
+    # The daemon runs in this process, so it sees the broken db.
+    monkeypatch.setattr(items.ItemsDB, "count", count)
+    assert daemon.forward(["count"]) == 1
+    output = capsys.readouterr().out
+    assert "Traceback" in output
+    assert "RuntimeError: disk I/O error" in output
+
+
+def test_forward_import_error(running_daemon, capsys, tmp_path):
+    assert daemon.forward(["import", str(tmp_path / "nope.jsonl")]) == 2
+    assert "Traceback" not in capsys.readouterr().out
+
+
+def test_forward_no_answer(tmp_path, capsys):
+    import socket
+
+    socket_path = tmp_path / "dropped.sock"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(socket_path))
+        server.listen()
+
+        def drop():
+            conn, _ = server.accept()
+            conn.close()
+
+        thread = threading.Thread(target=drop)
+        thread.start()
+        assert daemon.forward(["count"], socket_path) == 1
+        thread.join()
+    assert "No answer from the daemon" in capsys.readouterr().err
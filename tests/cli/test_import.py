@@ -0,0 +1,44 @@
+import items
+from items import Item
+
+from .conftest import runner
+
+
+def test_import_csv(items_db, items_cli, tmp_path):
+    path = tmp_path / "items.csv"
+    path.write_text("summary,owner,state\none,veit,done\ntwo,,\n")
+    assert items_cli(f"import {path}") == "Imported 2 items."
+    assert items_db.list_items() == [
+        Item(summary="one", owner="veit", state="done"),
+        Item(summary="two", owner="", state="todo"),
+    ]
+
+
+def test_import_jsonl(items_db, items_cli, tmp_path):
+    path = tmp_path / "items.txt"
+    path.write_text('{"summary": "one"}\n\n{"summary": "two", "owner": "vsc"}\n')
+    assert items_cli(f"import -f jsonl {path}") == "Imported 2 items."
+    assert items_db.count(owner="vsc") == 1
+
+
+def test_import_missing_summary(items_db, items_cli, tmp_path):
+    path = tmp_path / "items.jsonl"
+    path.write_text('{"summary": "one"}\n{"owner": "vsc"}\n')
+    assert items_cli(f"import {path}") == "Error: Missing summary, nothing imported."
+    assert items_db.count() == 0
+
+
+def test_import_invalid_jsonl(items_db, items_cli, tmp_path):
+    path = tmp_path / "items.jsonl"
+    path.write_text('{"summary": "one"}\n{"summary": \n')
+    output = items_cli(f"import {path}")
+    assert output.startswith("Error: Invalid jsonl file: ")
+    assert output.endswith(", nothing imported.")
+    assert items_db.count() == 0
+
+
+def test_import_missing_file(items_db, tmp_path):
+    result = runner.invoke(items.cli.app, ["import", str(tmp_path / "nope.jsonl")])
+    assert result.exit_code == 2
+    assert "Error" in result.output
+    assert items_db.count() == 0
@@ -0,0 +1,48 @@
+"""
+Import time budgets for the CLI, measured with `python -X importtime`.
+"""
+import subprocess
+import sys
+
+import pytest
+
+# Modules that only the commands working with the db should import.
+HEAVY_MODULES = {"sqlalchemy", "sqlmodel", "fastapi", "rich.table"}
+
+# Generous limit in microseconds for all imports of a light command.
+BUDGET_US = 300_000
+
+
+def import_times(command):
+    """Return a dict of cumulative import times by module for a CLI command."""
+    code = (
+        f"import sys; sys.argv = ['items'] + {command.split()!r}; "
+        "from items.daemon import main; main()"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = (int(cumulative), name.startswith("  "))
+    return times
+
+
+@pytest.mark.parametrize("command", ["version", "config"])
+def test_light_commands(command):
+    times = import_times(command)
+    assert "typer" in times
+    assert not HEAVY_MODULES & set(times)
+    total = sum(t for t, nested in times.values() if not nested)
+    assert total < BUDGET_US
+
+
+def test_list_imports_db(db_path, monkeypatch):
+    monkeypatch.setenv("ITEMS_DB_DIR", db_path.as_posix())
+    times = import_times("list")
+    assert {"sqlmodel", "rich.table"} <= set(times)
@@ -21,3 +21,14 @@ def test_main(items_db, items_cli):
     items_db.add_item(items.Item(summary="Update cibuildwheel section"))
     output = items_cli("")
     assert output.strip() == expected_output.strip()
+
+
+def test_list_in_chunks(items_db, items_cli, monkeypatch):
+    monkeypatch.setattr(items.cli, "LIST_CHUNK_SIZE", 1)
+    items_db.add_item(items.Item(summary="Update pytest section"))
+    items_db.add_item(items.Item(summary="Update cibuildwheel section"))
+    output = items_cli("list")
+    rows = [line.split() for line in output.strip().splitlines()]
+    assert rows[0] == ["ID", "state", "owner", "summary"]
+    assert rows[2] == ["1", "todo", "Update", "pytest", "section"]
+    assert rows[3] == ["2", "todo", "Update", "cibuildwheel", "section"]
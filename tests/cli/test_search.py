@@ -0,0 +1,15 @@
+import items
+
+expected_output = """\
+
+  ID   state   owner   summary                
+ ──────────────────────────────────────────── 
+  2    todo    veit    Update pytest section  
+"""
+
+
+def test_search(items_db, items_cli):
+    items_db.add_item(items.Item(summary="Update cibuildwheel section"))
+    items_db.add_item(items.Item(summary="Update pytest section", owner="veit"))
+    output = items_cli("search pyt")
+    assert output.strip() == expected_output.strip()
@@ -0,0 +1,19 @@
+import os
+
+import uvicorn
+
+
+def test_serve(items_cli, db_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(uvicorn, "run", lambda *args, **kwargs: calls.append(kwargs))
+    # Let monkeypatch restore the variables set by the command.
+    for name in ("PROFILE", "BUSY_TIMEOUT", "BUSY_RETRIES", "BUSY_BACKOFF",
+                 "GROUP_COMMIT_SIZE", "GROUP_COMMIT_DELAY"):
+        monkeypatch.setenv(f"ITEMS_DB_{name}", "")
+    items_cli("serve --workers 4 --port 9000 --busy-retries 7 --group-commit 50")
+    assert calls == [{"host": "127.0.0.1", "port": 9000, "workers": 4}]
+    assert os.environ["ITEMS_DB_DIR"] == db_path.as_posix()
+    assert os.environ["ITEMS_DB_PROFILE"] == "safe"
+    assert os.environ["ITEMS_DB_BUSY_RETRIES"] == "7"
+    assert os.environ["ITEMS_DB_BUSY_TIMEOUT"] == ""
+    assert os.environ["ITEMS_DB_GROUP_COMMIT_SIZE"] == "50"
@@ -0,0 +1,10 @@
+def test_stats(items_cli):
+    items_cli("count")
+    output = items_cli("stats")
+    assert "SELECT" in output
+    assert "count" in output
+
+
+def test_stats_prometheus(items_cli):
+    items_cli("count")
+    assert 'items_db_call_seconds_count{method="count"}' in items_cli("stats --prometheus")
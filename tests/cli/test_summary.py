@@ -0,0 +1,20 @@
+from items import Item
+
+expected_output = """\
+
+  owner   done   todo   total  
+ ───────────────────────────── 
+  veit       0      2       2  
+  vsc        1      0       1  
+ ───────────────────────────── 
+  total      1      2       3  
+"""
+
+
+def test_summary(items_db, items_cli):
+    items_db.add_items([
+        Item(summary="one", owner="veit"),
+        Item(summary="two", owner="veit"),
+        Item(summary="three", owner="vsc", state="done"),
+    ])
+    assert items_cli("summary").strip() == expected_output.strip()
@@ -0,0 +1,13 @@
+from items.utils import get_templates_compiled_dir
+
+
+def test_compile_templates(items_cli_no_redirect, tmp_path):
+    items_cli_no_redirect(f"compile-templates {tmp_path}")
+    assert list(tmp_path.iterdir())
+
+
+def test_compiled_dir_setting(monkeypatch, tmp_path):
+    monkeypatch.delenv("ITEMS_TEMPLATES_COMPILED_DIR", raising=False)
+    assert get_templates_compiled_dir() is None
+    monkeypatch.setenv("ITEMS_TEMPLATES_COMPILED_DIR", str(tmp_path))
+    assert get_templates_compiled_dir() == str(tmp_path)
@@ -32,7 +32,6 @@ def items_db(session_items_db, request, faker):
     m = request.node.get_closest_marker('num_items')
     if m and len(m.args) > 0:
         num_items = m.args[0]
-        for _ in range(num_items):
-            db.add_item(Item(summary=faker.sentence(),
-                             owner=faker.first_name()))
+        db.add_items(Item(summary=faker.sentence(), owner=faker.first_name())
+                     for _ in range(num_items))
     return db
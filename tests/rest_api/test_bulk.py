@@ -0,0 +1,89 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from items import Item
+from items.rest_api import app
+
+
+def test_add_items(items_db):
+    client = TestClient(app)
+    response = client.post(
+        "/items/bulk",
+        json=[{"summary": "one"}, {"summary": "two", "owner": "veit"}],
+    )
+    assert response.status_code == 200
+    ids = response.json()
+    assert len(ids) == 2
+    assert items_db.get_item(ids[1]) == Item(summary="two", owner="veit")
+
+
+def test_add_items_missing_summary(items_db):
+    client = TestClient(app)
+    response = client.post("/items/bulk", json=[{"summary": "one"}, {"owner": "veit"}])
+    assert response.status_code == 422
+    assert items_db.count() == 0
+
+
+def test_update_items(items_db):
+    ids = items_db.add_items([
+        Item(summary="one", state="done"),
+        Item(summary="two", state="in progress"),
+        Item(summary="three"),
+    ])
+    client = TestClient(app)
+    response = client.post(
+        "/items/bulk/update", json={"ids": ids[:2], "mods": {"owner": "vsc"}}
+    )
+    assert response.status_code == 200
+    assert items_db.count(owner="vsc") == 2
+    assert items_db.get_item(ids[0]) == Item(summary="one", owner="vsc", state="done")
+    assert items_db.get_item(ids[1]).state == "in progress"
+
+
+def test_update_items_ignores_id(items_db):
+    ids = items_db.add_items([Item(summary="one"), Item(summary="two")])
+    client = TestClient(app)
+    response = client.post(
+        "/items/bulk/update",
+        json={"ids": ids[:1], "mods": {"id": ids[1], "summary": "new"}},
+    )
+    assert response.status_code == 200
+    assert [i.summary for i in items_db.list_items()] == ["new", "two"]
+
+
+@pytest.mark.num_items(3)
+def test_delete_items(items_db):
+    client = TestClient(app)
+    ids = [i.id for i in items_db.list_items()][:2]
+    response = client.post("/items/bulk/delete", json={"ids": ids})
+    assert response.status_code == 200
+    assert items_db.count() == 1
+
+
+def test_delete_items_invalid(items_db):
+    client = TestClient(app)
+    response = client.post("/items/bulk/delete", json={"ids": [42]})
+    assert response.status_code == 404
+
+
+def test_transition_items(items_db):
+    ids = items_db.add_items([
+        Item(summary="one", owner="veit", state="in progress"),
+        Item(summary="two", owner="veit", state="todo"),
+    ])
+    client = TestClient(app)
+    response = client.post(
+        "/items/bulk/transition",
+        json={"state": "done", "from_state": "in progress", "owner": "veit"},
+    )
+    assert response.status_code == 200
+    assert response.json() == [ids[0]]
+    assert items_db.get_item(ids[1]).state == "todo"
+
+
+def test_transition_items_without_filter(items_db):
+    i = items_db.add_item(Item(summary="one"))
+    client = TestClient(app)
+    response = client.post("/items/bulk/transition", json={"state": "done"})
+    assert response.status_code == 422
+    assert items_db.get_item(i).state == "todo"
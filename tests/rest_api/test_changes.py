@@ -0,0 +1,65 @@
+import asyncio
+import json
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from items import Item
+from items.rest_api import _change_events, app
+
+
+def test_changes(items_db):
+    since = items_db.last_change()
+    i = items_db.add_item(Item(summary="one", owner="veit"))
+    client = TestClient(app)
+    response = client.get("/items/changes", params={"since": since})
+    assert response.status_code == 200
+    assert response.json() == {
+        "seq": since + 1,
+        "reset": False,
+        "items": [{"id": i, "summary": "one", "owner": "veit", "state": "todo"}],
+        "deleted": [],
+    }
+
+
+def test_changes_long_poll_timeout(items_db):
+    since = items_db.last_change()
+    client = TestClient(app)
+    start = time.perf_counter()
+    response = client.get("/items/changes", params={"since": since, "wait": 0.3})
+    assert time.perf_counter() - start >= 0.3
+    assert response.json()["items"] == []
+    assert response.json()["seq"] == since
+
+
+def test_changes_long_poll(items_db):
+    since = items_db.last_change()
+    writer = threading.Timer(0.2, items_db.add_item, [Item(summary="late")])
+    writer.start()
+    client = TestClient(app)
+    start = time.perf_counter()
+    response = client.get("/items/changes", params={"since": since, "wait": 10})
+    writer.join()
+    assert time.perf_counter() - start < 5
+    assert [i["summary"] for i in response.json()["items"]] == ["late"]
+
+
+def test_change_events(items_db):
+    # TestClient reads whole responses, so read the endless stream directly.
+    since = items_db.last_change()
+    i = items_db.add_item(Item(summary="one"))
+
+    async def first_event():
+        events = _change_events(since)
+        try:
+            return await anext(events)
+        finally:
+            await events.aclose()
+
+    event = asyncio.run(first_event())
+    id_line, event_line, data_line, *_ = event.split("\n")
+    assert id_line == f"id: {since + 1}"
+    assert event_line == "event: changes"
+    data = json.loads(data_line.removeprefix("data: "))
+    assert [item["id"] for item in data["items"]] == [i]
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from items import Item
+from items.rest_api import app
+from items.utils import close_async_items_dbs
+
+
+@pytest.mark.num_items(3)
+def test_etag(items_db):
+    client = TestClient(app)
+    response = client.get("/items")
+    assert response.status_code == 200
+    assert response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+
+    again = client.get("/items", headers={"If-None-Match": response.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.content == b""
+
+
+@pytest.mark.num_items(3)
+def test_etag_changes_on_write(items_db):
+    client = TestClient(app)
+    etag = client.get("/items").headers["ETag"]
+    items_db.add_item(Item(summary="do something"))
+    response = client.get("/items", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(response.json()) == 4
+
+
+@pytest.mark.num_items(3)
+def test_if_modified_since(items_db):
+    client = TestClient(app)
+    last_modified = client.get("/items").headers["Last-Modified"]
+    response = client.get("/items", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+    response = client.get(
+        "/items", headers={"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"}
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.num_items(3)
+def test_etag_html(items_db):
+    client = TestClient(app)
+    response = client.get("/items", headers={"HX-Request": "true"})
+    assert response.headers["content-type"].startswith("text/html")
+    etag = response.headers["ETag"]
+    response = client.get("/items", headers={"HX-Request": "true", "If-None-Match": etag})
+    assert response.status_code == 304
+
+
+@pytest.mark.num_items(3)
+def test_etag_per_representation(items_db):
+    client = TestClient(app)
+    json_etag = client.get("/items").headers["ETag"]
+    ndjson_etag = client.get(
+        "/items", headers={"Accept": "application/x-ndjson"}
+    ).headers["ETag"]
+    assert json_etag != ndjson_etag
+    response = client.get("/items", headers={"HX-Request": "true", "If-None-Match": json_etag})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+    assert response.headers["ETag"] not in (json_etag, ndjson_etag)
+
+
+@pytest.mark.num_items(3)
+def test_etag_cached_write_by_other_db(items_db, monkeypatch):
+    monkeypatch.setenv("ITEMS_DB_CACHE_SIZE", "100")
+    asyncio.run(close_async_items_dbs())
+    with TestClient(app) as client:
+        response = client.get("/items")
+        assert len(response.json()) == 3
+        # items_db is another ItemsDB, which the cache of the app does not see.
+        items_db.add_item(Item(summary="new"))
+        response = client.get("/items")
+        assert len(response.json()) == 4
+        etag = response.headers["ETag"]
+        response = client.get("/items", headers={"HX-Request": "true"})
+        assert response.text.count("<tr>") == 4
+        assert client.get("/items", headers={"If-None-Match": etag}).status_code == 304
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 
@@ -12,3 +14,30 @@ def test_items(items_db):
     j = response.json()
     assert len(j) == 3
 
+
+
+@pytest.mark.num_items(5)
+def test_items_paginated(items_db):
+    client = TestClient(app)
+    first = client.get("/items", params={"limit": 2}).json()
+    assert len(first) == 2
+    rest = client.get("/items", params={"after": first[-1]["id"]}).json()
+    assert len(rest) == 3
+    assert [i["id"] for i in first + rest] == sorted(i.id for i in items_db.list_items())
+
+
+@pytest.mark.num_items(3)
+def test_items_ndjson(items_db):
+    client = TestClient(app)
+    response = client.get("/items", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [i["id"] for i in lines] == [i.id for i in items_db.list_items()]
+
+
+@pytest.mark.num_items(2)
+def test_items_lifespan(items_db):
+    with TestClient(app) as client:
+        assert len(client.get("/items").json()) == 2
+        assert len(client.get("/items").json()) == 2
@@ -0,0 +1,19 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from items.rest_api import app
+from items.utils import close_async_items_dbs, open_async_items_db
+
+
+def test_add_item_group_commit(items_db, monkeypatch):
+    monkeypatch.setenv("ITEMS_DB_GROUP_COMMIT_SIZE", "10")
+    monkeypatch.setenv("ITEMS_DB_GROUP_COMMIT_DELAY", "0.001")
+    asyncio.run(close_async_items_dbs())
+    with TestClient(app) as client:
+        db = client.portal.call(open_async_items_db)
+        assert db._group_commit.max_items == 10
+        for i in range(3):
+            response = client.post("/add_item", json={"summary": f"item {i}"})
+            assert response.status_code == 200
+    assert items_db.count() == 3
@@ -0,0 +1,33 @@
+import json
+
+import pydantic_core
+import pytest
+from fastapi.testclient import TestClient
+
+from items import Item
+from items.rest_api import PreserveJSONResponse, app, get_json_dumps
+
+
+@pytest.mark.parametrize("dumps", [get_json_dumps(), pydantic_core.to_json])
+def test_dumps(dumps):
+    content = [
+        Item(id=1, summary="zero", owner="veit", state="todo"),
+        {"id": 2, "summary": "eins – zwei", "owner": "", "state": "done"},
+    ]
+    assert json.loads(dumps(content)) == [
+        {"id": 1, "summary": "zero", "owner": "veit", "state": "todo"},
+        {"id": 2, "summary": "eins – zwei", "owner": "", "state": "done"},
+    ]
+
+
+def test_pluggable(monkeypatch):
+    monkeypatch.setattr(PreserveJSONResponse, "dumps", staticmethod(lambda c: b"[]"))
+    assert PreserveJSONResponse([1, 2]).body == b"[]"
+
+
+@pytest.mark.num_items(3)
+def test_items_from_rows(items_db):
+    client = TestClient(app)
+    assert client.get("/items").json() == [
+        item.model_dump() for item in items_db.list_items()
+    ]
@@ -0,0 +1,13 @@
+from fastapi.testclient import TestClient
+
+from items.rest_api import app
+
+
+def test_metrics(items_db):
+    with TestClient(app) as client:
+        client.get("/items")
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert 'items_db_call_seconds_count{method="list_rows"}' in response.text
+    assert 'items_sql_statement_seconds_count{statement="SELECT"}' in response.text
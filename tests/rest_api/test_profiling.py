@@ -0,0 +1,93 @@
+import asyncio
+import pstats
+
+import pytest
+from fastapi.testclient import TestClient
+
+from items import profiling as items_profiling
+from items.rest_api import app
+
+
+@pytest.fixture()
+def profiling(monkeypatch, tmp_path):
+    monkeypatch.setenv("ITEMS_PROFILING_HOSTS", "testclient")
+    monkeypatch.setenv("ITEMS_PROFILING_DIR", tmp_path.as_posix())
+    return tmp_path
+
+
+@pytest.mark.num_items(3)
+def test_profile_json(profiling):
+    client = TestClient(app)
+    response = client.get("/items", headers={"X-Items-Profile": "1"})
+    assert response.status_code == 200
+    assert len(response.json()) == 3
+    profile_id = response.headers["X-Items-Profile"]
+    timing = response.headers["Server-Timing"]
+    for name in ("db", "serialize", "endpoint", "total"):
+        assert f"{name};dur=" in timing
+    stats = pstats.Stats((profiling / f"{profile_id}.prof").as_posix())
+    assert stats.total_calls > 0
+
+    download = client.get(f"/profiles/{profile_id}")
+    assert download.status_code == 200
+    assert download.content == (profiling / f"{profile_id}.prof").read_bytes()
+
+
+@pytest.mark.num_items(3)
+def test_profile_html_stream(profiling):
+    client = TestClient(app)
+    response = client.get("/items?_profile=1", headers={"Accept": "text/html"})
+    assert response.status_code == 200
+    assert response.text.count("<tr") >= 3
+    assert "render;dur=" in response.headers["Server-Timing"]
+
+
+def test_profile_not_allowed(profiling, monkeypatch):
+    monkeypatch.setenv("ITEMS_PROFILING_HOSTS", "127.0.0.1")
+    client = TestClient(app)
+    response = client.get("/items", headers={"X-Items-Profile": "1"})
+    assert response.status_code == 200
+    assert "X-Items-Profile" not in response.headers
+    assert list(profiling.iterdir()) == []
+    assert client.get("/profiles/" + "0" * 32).status_code == 404
+
+
+def test_no_profile(profiling):
+    response = TestClient(app).get("/items")
+    assert "X-Items-Profile" not in response.headers
+    assert "Server-Timing" not in response.headers
+
+
+def test_profile_event_stream_passed_through(profiling):
+    sent = []
+    more = asyncio.Event()
+
+    async def endless(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream")]})
+        await send({"type": "http.response.body", "body": b"data: 1\n\n",
+                    "more_body": True})
+        await more.wait()
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        sent.append(message)
+
+    async def scenario():
+        scope = {"type": "http", "method": "GET", "path": "/stream",
+                 "query_string": b"_profile=1", "headers": [],
+                 "client": ("testclient", 50000)}
+        middleware = items_profiling.ProfilingMiddleware(endless)
+        task = asyncio.create_task(middleware(scope, None, send))
+        await asyncio.sleep(0.01)
+        # The stream is sent as it goes, and other requests may be profiled.
+        assert [m["type"] for m in sent] == ["http.response.start",
+                                            "http.response.body"]
+        assert not items_profiling._lock.locked()
+        more.set()
+        await task
+
+    asyncio.run(scenario())
+    assert len(sent) == 3
+    assert sent[0]["headers"] == [(b"content-type", b"text/event-stream")]
+    assert list(profiling.iterdir()) == []
@@ -0,0 +1,18 @@
+from fastapi.testclient import TestClient
+
+from items import Item
+from items.rest_api import app
+
+
+def test_search(items_db):
+    ids = items_db.add_items([
+        Item(summary="Update pytest section", owner="veit"),
+        Item(summary="Update cibuildwheel section", owner="vsc"),
+    ])
+    client = TestClient(app)
+    response = client.get("/items/search", params={"q": "update", "owner": "vsc"})
+    assert response.status_code == 200
+    assert response.json() == [
+        {"id": ids[1], "summary": "Update cibuildwheel section", "owner": "vsc",
+         "state": "todo"},
+    ]
@@ -0,0 +1,18 @@
+from fastapi.testclient import TestClient
+
+from items import Item
+from items.rest_api import app
+
+
+def test_summary(items_db):
+    items_db.add_items([
+        Item(summary="one", owner="veit"),
+        Item(summary="two", owner="vsc", state="done"),
+    ])
+    client = TestClient(app)
+    response = client.get("/items/summary")
+    assert response.status_code == 200
+    assert response.json() == {"veit": {"todo": 1}, "vsc": {"done": 1}}
+    assert client.get("/items/summary", params={"owner": "vsc"}).json() == {
+        "vsc": {"done": 1}
+    }
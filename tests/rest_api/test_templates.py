@@ -0,0 +1,61 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from jinja2 import FileSystemLoader
+
+from items.rest_api import (
+    PreserveJSONResponse,
+    app,
+    get_jinja_env,
+    get_template_render_route_class,
+    precompile_templates,
+)
+
+
+def test_shared_env():
+    assert get_jinja_env("templates") is get_jinja_env("templates")
+
+
+@pytest.mark.num_items(3)
+def test_no_lookup_per_request(items_db, monkeypatch):
+    def get_source(*args):
+        raise AssertionError("template looked up on request")
+
+    monkeypatch.setattr(FileSystemLoader, "get_source", get_source)
+    client = TestClient(app)
+    response = client.get("/items", headers={"HX-Request": "true"})
+    assert response.headers["content-type"].startswith("text/html")
+    response = client.post("/items/bulk/delete", json={"ids": []})
+    assert response.json() == []
+
+
+def test_precompiled(tmp_path):
+    precompile_templates("templates", str(tmp_path))
+    assert list(tmp_path.iterdir())
+
+    compiled_app = FastAPI(default_response_class=PreserveJSONResponse)
+    compiled_app.router.route_class = get_template_render_route_class(
+        "templates", str(tmp_path)
+    )
+
+    @compiled_app.get("/items")
+    def get_all_items():
+        return [{"owner": "veit", "summary": "do something", "state": "todo"}]
+
+    response = TestClient(compiled_app).get("/items", headers={"Accept": "text/html"})
+    assert "<td>do something</td>" in response.text
+
+
+@pytest.mark.num_items(3)
+def test_html_streamed_without_json(items_db, monkeypatch):
+    def render(*args):
+        raise AssertionError("JSON rendered for an HTML request")
+
+    monkeypatch.setattr(PreserveJSONResponse, "render", render)
+    client = TestClient(app)
+    response = client.get("/items", headers={"HX-Request": "true"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+    assert response.text.count("<tr>") == 3
+    for item in items_db.list_items():
+        assert f"<td>{item.summary}</td>" in response.text